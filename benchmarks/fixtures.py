@@ -0,0 +1,206 @@
+"""
+Corpus of pages captured from the shows' websites, for benchmarking
+the spiders' callbacks offline (see `benchmarks.parse`).
+
+The corpus lives in `benchmarks/fixtures/<spider>/`: one file per page
+and a `manifest.json` that lists the URL, headers, callback and
+request meta of each page.
+
+Capture (or refresh) the corpus by crawling the real websites with:
+    python -m benchmarks.fixtures [SPIDER ...]
+
+Commit the captured pages, so that benchmark results of different
+commits are comparable. Refresh them when a broadcaster redesigns its
+website.
+
+Where the websites can't be reached, build a corpus of made-up pages
+instead (see `benchmarks.synthetic`), which is marked as synthetic in
+its manifests:
+    python -m benchmarks.fixtures --synthetic
+"""
+
+import argparse
+import datetime
+import hashlib
+import json
+import pathlib
+import shutil
+
+from scrapy import signals
+from scrapy.crawler import CrawlerProcess
+from scrapy.http import Headers, HtmlResponse, Request
+from scrapy.utils.project import get_project_settings
+
+
+FIXTURES_DIR = pathlib.Path(__file__).parent / "fixtures"
+
+
+class Fixture:
+    """A captured page."""
+
+    def __init__(
+        self,
+        spider_dir: pathlib.Path,
+        entry: dict,
+        synthetic: bool = False,
+    ):
+        self.url: str = entry["url"]
+        self.callback: str | None = entry["callback"]
+        """Name of the spider method that parses the page,
+        None for tickets pages"""
+        self.meta: dict = entry["meta"]
+        self.headers: dict = entry["headers"]
+        self.body = (spider_dir / entry["file"]).read_bytes()
+        self.synthetic = synthetic
+        """Whether the page is made up instead of captured"""
+
+    def response(self) -> HtmlResponse:
+        """
+        Return a new response for the page.
+        (Responses cache their selectors, so reusing them would
+        only benchmark the first call.)
+        """
+        return HtmlResponse(
+            url=self.url,
+            headers=Headers(self.headers),
+            body=self.body,
+            request=Request(self.url, meta=self.meta),
+        )
+
+
+def load_fixtures(
+    fixtures_dir: pathlib.Path = FIXTURES_DIR,
+) -> dict[str, list[Fixture]]:
+    """Return the captured pages of each spider."""
+    fixtures = {}
+    for manifest_file in sorted(fixtures_dir.glob("*/manifest.json")):
+        spider_dir = manifest_file.parent
+        with manifest_file.open("r") as f:
+            manifest = json.load(f)
+        fixtures[spider_dir.name] = [
+            Fixture(spider_dir, entry, manifest.get("synthetic", False))
+            for entry in manifest["pages"]
+        ]
+    return fixtures
+
+
+class FixtureRecorder:
+    """Writes every response of a spider to the fixtures directory."""
+
+    def __init__(self, spider_dir: pathlib.Path, synthetic: bool = False):
+        self.spider_dir = spider_dir
+        self.synthetic = synthetic
+        self.pages = []
+
+    def spider_opened(self, spider):
+        # Don't keep pages that the website doesn't have anymore:
+        shutil.rmtree(self.spider_dir, ignore_errors=True)
+        self.spider_dir.mkdir(parents=True)
+
+    def response_received(self, response, request, spider):
+        if response.status != 200:
+            return
+        tickets_urls = {
+            url for url, _ in getattr(
+                spider, "tickets_pages_and_locations", [])
+        }
+        if request.url in tickets_urls:
+            # Downloaded by TicketsPageCache, not parsed by a callback
+            callback = None
+        elif request.callback is None:
+            callback = "parse"
+        else:
+            callback = request.callback.__name__
+        file_name = (
+            hashlib.sha256(response.url.encode()).hexdigest()[:16] + ".html"
+        )
+        (self.spider_dir / file_name).write_bytes(response.body)
+        self.pages.append({
+            "url": response.url,
+            "file": file_name,
+            "callback": callback,
+            "meta": {
+                key: request.meta[key]
+                for key in ["talkshow_data"]
+                if key in request.meta
+            },
+            "headers": {
+                key: response.headers[key]
+                for key in ["Content-Type"]
+                if key in response.headers
+            },
+        })
+
+    def spider_closed(self, spider):
+        if self.synthetic:
+            # No date, so that building the same pages again doesn't
+            # change the manifest:
+            header = {"synthetic": True}
+        else:
+            header = {"captured_on": datetime.datetime.now().isoformat()}
+        with (self.spider_dir / "manifest.json").open("w") as f:
+            json.dump(
+                {
+                    **header,
+                    "pages": sorted(self.pages, key=lambda p: p["url"]),
+                },
+                f,
+                indent=2,
+                ensure_ascii=False,
+                default=bytes.decode,
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Capture the pages of the shows' websites"
+    )
+    parser.add_argument(
+        "spiders",
+        nargs="*",
+        help="Spiders whose pages to capture (default: all)",
+    )
+    parser.add_argument(
+        "--fixtures-dir",
+        type=pathlib.Path,
+        default=FIXTURES_DIR,
+    )
+    parser.add_argument(
+        "--synthetic",
+        action="store_true",
+        help="Capture made-up pages instead of the real websites "
+             "(see benchmarks.synthetic)",
+    )
+    args = parser.parse_args()
+
+    settings = get_project_settings()
+    # Always download complete pages (instead of replaying callbacks of
+    # unchanged ones or using cached pages) and don't touch the history:
+    settings.set("CONDITIONAL_CACHE_ENABLED", False)
+    settings.set("HTTPCACHE_ENABLED", False)
+    settings.set("HISTORY_FILE", None)
+    if args.synthetic:
+        settings.set("DOWNLOADER_MIDDLEWARES", {
+            **settings.getdict("DOWNLOADER_MIDDLEWARES"),
+            "benchmarks.synthetic.SyntheticSiteMiddleware": 960,
+        })
+    process = CrawlerProcess(settings)
+    # Signal handlers are only weakly referenced:
+    recorders = []
+    for spider_name in args.spiders or process.spider_loader.list():
+        crawler = process.create_crawler(spider_name)
+        recorder = FixtureRecorder(
+            args.fixtures_dir / spider_name, synthetic=args.synthetic)
+        recorders.append(recorder)
+        crawler.signals.connect(
+            recorder.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(
+            recorder.response_received, signal=signals.response_received)
+        crawler.signals.connect(
+            recorder.spider_closed, signal=signals.spider_closed)
+        process.crawl(crawler)
+    process.start()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark for parsing guest lists (`TalkshowItem.parse_guest_list`).
+
+Run with:
+    python -m benchmarks.guest_list
+
+Parses the guest lists that the Maischberger spider took from the
+overview pages in the captured corpus (see `benchmarks.fixtures`), as
+well as the examples in `CORPUS`.
+"""
+
+import argparse
+import pathlib
+import timeit
+
+from talkshowguests.items import TalkshowItem
+
+from .fixtures import FIXTURES_DIR, load_fixtures
+
+
+CORPUS = [
+    # Maischberger overview page (the examples in the docstring of
+    # `TalkshowItem.parse_guest_list`):
+    "Marie-Agnes Strack-Zimmermann (FDP), Jan van Aken (Die Linke), "
+    "Eckart von Hirschhausen (Arzt & Wissenschaftsjournalist), "
+    "Amelie Fried (Autorin & Journalistin), "
+    "Daniel Friedrich Sturm (Der Tagesspiegel) und "
+    "Yasmine M’Barek (Zeit Online)",
+    "Markus Söder, CSU (bayerischer Ministerpräsident), "
+    "Klaus von Dohnanyi, SPD (langjähriger Spitzenpolitiker), "
+    "Béla Réthy (Sportjournalist), Dagmar Rosenfeld (Media Pioneer) "
+    "und Sonja Zekri (Süddeutsche Zeitung).",
+]
+
+
+def get_captured_guest_lists(
+    fixtures_dir: pathlib.Path = FIXTURES_DIR,
+) -> tuple[list[str], bool]:
+    """
+    Return the guest lists that the Maischberger spider passed on to
+    the episode pages in the captured corpus, and whether the corpus
+    is synthetic.
+    """
+    fixtures = load_fixtures(fixtures_dir).get("maischberger", [])
+    guest_lists = [
+        fixture.meta["talkshow_data"]["guest_list"]
+        for fixture in fixtures
+        if fixture.callback == "parse_episode_page"
+    ]
+    return guest_lists, any(fixture.synthetic for fixture in fixtures)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--scale",
+        type=int,
+        help="Also parse guest lists this many times longer "
+             "than those in the corpus",
+        default=20,
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--fixtures-dir",
+        type=pathlib.Path,
+        default=FIXTURES_DIR,
+    )
+    args = parser.parse_args()
+
+    captured, synthetic = get_captured_guest_lists(args.fixtures_dir)
+    if not captured:
+        print(
+            f"No captured Maischberger pages in {args.fixtures_dir}, "
+            f"only parsing the examples\n"
+        )
+    elif synthetic:
+        print("Made-up guest lists (see benchmarks.synthetic)\n")
+    guest_lists = CORPUS + captured
+    corpus = guest_lists + [
+        ", ".join([guest_list] * args.scale) for guest_list in guest_lists
+    ]
+    for guest_list in corpus:
+        number, _ = timeit.Timer(
+            lambda: TalkshowItem.parse_guest_list(guest_list)
+        ).autorange()
+        best = min(timeit.repeat(
+            lambda: TalkshowItem.parse_guest_list(guest_list),
+            number=number,
+            repeat=args.repeat,
+        ))
+        print(
+            f"{len(guest_list):6} chars: "
+            f"{best / number * 1e6:10.1f} µs per guest list"
+        )
+
+
+if __name__ == "__main__":
+    main()
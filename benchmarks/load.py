@@ -0,0 +1,383 @@
+"""
+Load test: crawl hundreds of synthetic shows in one CrawlerProcess,
+as `talkshowguests` does with the real ones.
+
+A local HTTP server (in a separate process) generates pages shaped
+like those of daserste.de, wdr.de, zdf.de and tvtickets.de for each
+synthetic show. Each show is crawled by its own instance of the
+matching spider, pointed at the server by overriding `start_urls`
+(and `tickets_pages_and_locations`) through spider arguments.
+
+Run with:
+    python -m benchmarks.load --shows 200 --episodes 20
+
+Reports total crawl time, requests per second, the depth of the
+schedulers' queues and peak memory. Use `--set NAME=VALUE` to try
+different Scrapy settings.
+"""
+
+import argparse
+import datetime
+import http.server
+import json
+import multiprocessing
+import random
+import resource
+import tempfile
+import time
+import urllib.parse
+
+from scrapy import signals
+from scrapy.crawler import CrawlerProcess
+from scrapy.utils.project import get_project_settings
+
+
+SPIDERS = [
+    "carenmiosga",
+    "hartaberfair",
+    "maischberger",
+    "markuslanz",
+    "maybritillner",
+]
+"""Shows are assigned to these spiders in turn"""
+
+_FIRST_NAMES = ["Anna", "Ben", "Carla", "Dieter", "Eva", "Frank", "Gül"]
+_LAST_NAMES = ["Beispiel", "Test", "Muster", "Probe", "Schmidt", "Yılmaz"]
+_AFFILIATIONS = ["SPD", "CDU", "Grüne", "Autorin", "Zeit Online", "Arzt"]
+
+
+class SyntheticSite:
+    """
+    Pages of `shows` synthetic shows with `episodes` episodes each,
+    half of them in the past. Paths look like /<spider>/<show>/...
+    """
+
+    def __init__(self, shows: int, episodes: int, guests: int):
+        self.shows = shows
+        self.episodes = episodes
+        self.guests = guests
+        self.today = datetime.date.today()
+
+    def date(self, episode: int) -> datetime.date:
+        return self.today + datetime.timedelta(
+            days=7 * (episode - self.episodes // 2))
+
+    def guest_list(self, show: int, episode: int) -> list[tuple[str, str]]:
+        rnd = random.Random(show * 100_000 + episode)
+        return [
+            (
+                f"{rnd.choice(_FIRST_NAMES)} {rnd.choice(_LAST_NAMES)}",
+                rnd.choice(_AFFILIATIONS),
+            )
+            for _ in range(self.guests)
+        ]
+
+    def render(self, path: str) -> str | None:
+        """Return the page at `path` or None if there is none."""
+        parts = path.strip("/").split("/")
+        if len(parts) != 3:
+            return None
+        spider, show, page = parts
+        if not show.isdigit() or int(show) >= self.shows:
+            return None
+        render = getattr(self, f"_render_{spider}", None)
+        return render(int(show), page) if render else None
+
+    def _episode(self, page: str) -> int | None:
+        if page.startswith("ep") and page.endswith(".html"):
+            episode = page[2:-5]
+            if episode.isdigit() and int(episode) < self.episodes:
+                return int(episode)
+        return None
+
+    def _render_tickets(self, show: int, page: str) -> str:
+        dates = "".join(
+            f'<div class="date_wrapper">'
+            f'<span class="day">{date.day}</span>'
+            f'<span class="month">{month}</span>'
+            f'<span class="year">{date.year}</span>'
+            f'<span class="termin_abholen"> 17:00 </span>'
+            f'<span class="btn_tickets_buchen_info">BUCHEN</span></div>'
+            for e in range(self.episodes)
+            # Recordings alternate between the two tickets pages:
+            if e % 2 == (page == "koe")
+            for date in [self.date(e)]
+            for month in [[
+                "JAN", "FEB", "MÄR", "APR", "MAI", "JUN", "JUL", "AUG",
+                "SEP", "OKT", "NOV", "DEZ"][date.month - 1]]
+        )
+        return f"<html><body>{dates}</body></html>"
+
+    def _render_maischberger(self, show: int, page: str) -> str | None:
+        if page == "index.html":
+            teasers = "".join(
+                f'<div class="teaser"><h4 class="headline">'
+                f'<a href="ep{e}.html">Maischberger am '
+                f'{self.date(e):%d.%m.%Y}</a></h4>'
+                f'<p class="teasertext"><a>Zu Gast: '
+                + ", ".join(
+                    f"{name} ({affiliation})"
+                    for name, affiliation in self.guest_list(show, e)[:-1]
+                )
+                + " und {} ({})".format(*self.guest_list(show, e)[-1])
+                + "\xa0|\xa0</a></p></div>"
+                for e in range(self.episodes)
+            )
+            return f"<html><body>{teasers}</body></html>"
+        if (episode := self._episode(page)) is not None:
+            return (
+                f'<html><body><div class="con">'
+                f"<p>Thema A {show}/{episode}: ...</p>"
+                f"<p>Thema B: ...</p><p>Es kommentieren: ...</p>"
+                f"</div></body></html>"
+            )
+        return None
+
+    def _render_carenmiosga(self, show: int, page: str) -> str | None:
+        links = "".join(
+            f'<h3 class="ressort">Sendung</h3><div class="teaser">'
+            f'<h4 class="headline"><a href="ep{e}.html">{e}</a></h4></div>'
+            for e in range(self.episodes)
+        )
+        if page == "index.html":
+            return (
+                f"<html><head><title>Alle Sendungen</title></head>"
+                f"<body>{links}</body></html>"
+            )
+        if (episode := self._episode(page)) is not None:
+            infotexts = "".join(
+                f'<p class="infotext">{name}\xa0|\xa0{affiliation}</p>'
+                for name, affiliation in self.guest_list(show, episode)
+            )
+            return (
+                f"<html><head><title>Sendung {episode}</title></head><body>"
+                f"<h1>Thema {show}/{episode}</h1>"
+                f'<div class="infoBroadcastDateBox">'
+                f"<p>So {self.date(episode):%d.%m.%y}</p></div>"
+                f'<div class="mediaLeft">{infotexts}</div>'
+                f"{links}</body></html>"
+            )
+        return None
+
+    def _render_hartaberfair(self, show: int, page: str) -> str | None:
+        if page != "index.html":
+            return None
+        sections = "".join(
+            f'<div class="sectionA"><h2 class="conHeadline">'
+            f"Sendung vom {self.date(e):%d.%m.%Y}</h2>"
+            f'<div class="teaser"><a href="ep{e}.html" '
+            f'title="Thema {show}/{e}">Thema</a></div></div>'
+            f'<div class="sectionA"><h2 class="conHeadline">Gäste</h2>'
+            + "".join(
+                f'<div class="box"><h4 class="headline">{name}</h4></div>'
+                for name, _ in self.guest_list(show, e)
+            )
+            + "</div>"
+            for e in range(self.episodes)
+        )
+        return f"<html><body>{sections}</body></html>"
+
+    def _render_zdf(self, show: int, page: str) -> str | None:
+        if page != "index.html":
+            return None
+        episodes = [
+            {
+                "editorialDate": f"{self.date(e)}T22:15:00Z",
+                "teaser": {"description": f"Thema {show}/{e}"},
+                "longInfoText": {"items": [{"paragraph": [
+                    {"text": "Zu Gast: " + ", ".join(
+                        f"<strong>{name}</strong>"
+                        for name, _ in self.guest_list(show, e))},
+                    {"text": "<ul>" + "".join(
+                        f"<li>{name}, {affiliation}</li>"
+                        for name, affiliation in self.guest_list(show, e)
+                    ) + "</ul>"},
+                    {"text": f"„Thema {show}/{e}“ um 22:15 Uhr im ZDF"},
+                ]}]},
+            }
+            for e in range(self.episodes)
+        ]
+        flight_data = [{"result": {"data": {"smartCollectionByCanonical": {
+            "seasons": {"nodes": [{"episodes": {"nodes": episodes}}]},
+        }}}}]
+        scripts = [
+            # React boilerplate
+            ["$", "div", None, {"children": ["$", "span", None, {}]}]
+        ] * 20 + [flight_data]
+        return "<html><body>" + "".join(
+            "<script>self.__next_f.push([1,\"{}:{}\"])</script>".format(
+                i, json.dumps(json.dumps(obj))[1:-1])
+            for i, obj in enumerate(scripts)
+        ) + "</body></html>"
+
+    _render_markuslanz = _render_zdf
+    _render_maybritillner = _render_zdf
+
+
+def _serve(site: SyntheticSite, port_queue: multiprocessing.Queue):
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = site.render(urllib.parse.urlsplit(self.path).path)
+            if body is None:
+                self.send_error(404)
+                return
+            body = body.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    class Server(http.server.ThreadingHTTPServer):
+        # All crawlers connect at once
+        request_queue_size = 1024
+
+    server = Server(("127.0.0.1", 0), Handler)
+    port_queue.put(server.server_address[1])
+    server.serve_forever()
+
+
+def get_spider_kwargs(spider: str, show: int, base_url: str) -> dict:
+    """Arguments that point a spider at a show on the synthetic site."""
+    kwargs = {
+        # Separate caches for each show:
+        "name": f"{spider}-{show}",
+        "start_urls": [f"{base_url}/{spider}/{show}/index.html"],
+    }
+    if spider == "carenmiosga":
+        kwargs["tickets_pages_and_locations"] = [
+            (f"{base_url}/tickets/{show}/ber", "Berlin Adlershof"),
+        ]
+    elif spider == "maischberger":
+        kwargs["tickets_pages_and_locations"] = [
+            (f"{base_url}/tickets/{show}/ber", "Berlin Adlershof"),
+            (f"{base_url}/tickets/{show}/koe", "Köln WDR Studio"),
+        ]
+    return kwargs
+
+
+class QueueDepthSampler:
+    """Samples the number of scheduled but not yet downloaded requests."""
+
+    def __init__(self, crawlers):
+        self.crawlers = crawlers
+        self.samples: list[int] = []
+
+    def sample(self):
+        depth = 0
+        for crawler in self.crawlers:
+            if crawler.stats is not None:
+                depth += (
+                    crawler.stats.get_value("scheduler/enqueued", 0)
+                    - crawler.stats.get_value("scheduler/dequeued", 0)
+                )
+        self.samples.append(depth)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--shows", type=int, default=200)
+    parser.add_argument(
+        "--episodes",
+        type=int,
+        help="Episodes per show",
+        default=20,
+    )
+    parser.add_argument(
+        "--guests",
+        type=int,
+        help="Guests per episode",
+        default=5,
+    )
+    parser.add_argument(
+        "--set",
+        metavar="NAME=VALUE",
+        action="append",
+        help="Override a Scrapy setting",
+        default=[],
+    )
+    args = parser.parse_args()
+
+    site = SyntheticSite(args.shows, args.episodes, args.guests)
+    port_queue = multiprocessing.Queue()
+    server = multiprocessing.Process(
+        target=_serve, args=(site, port_queue), daemon=True)
+    server.start()
+    base_url = f"http://127.0.0.1:{port_queue.get()}"
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        settings = get_project_settings()
+        settings.set("LOG_LEVEL", "WARNING")
+        # Each crawler would need a port of its own:
+        settings.set("TELNETCONSOLE_ENABLED", False)
+        # Measure the crawler, not the politeness towards our own server
+        # (use --set AUTOTHROTTLE_ENABLED=True to include it):
+        settings.set("AUTOTHROTTLE_ENABLED", False)
+        settings.set("HISTORY_FILE", f"{tmp_dir}/history.sqlite")
+        settings.set("CONDITIONAL_CACHE_DIR", f"{tmp_dir}/conditionalcache")
+        settings.set("ZDF_SCRIPT_CACHE_DIR", f"{tmp_dir}/zdfscriptcache")
+        settings.set("HTTPCACHE_DIR", f"{tmp_dir}/httpcache")
+        for setting in args.set:
+            name, value = setting.split("=", 1)
+            settings.set(name, value)
+
+        process = CrawlerProcess(settings)
+        crawlers = []
+        for show in range(args.shows):
+            spider = SPIDERS[show % len(SPIDERS)]
+            crawler = process.create_crawler(spider)
+            crawlers.append(crawler)
+            process.crawl(crawler, **get_spider_kwargs(spider, show, base_url))
+
+        sampler = QueueDepthSampler(crawlers)
+        items = 0
+
+        def item_scraped():
+            nonlocal items
+            items += 1
+
+        for crawler in crawlers:
+            crawler.signals.connect(item_scraped, signal=signals.item_scraped)
+
+        # (Imported here, after CrawlerProcess installed the reactor)
+        from twisted.internet import task
+        sampling = task.LoopingCall(sampler.sample)
+        sampling.start(0.1)
+        start = time.perf_counter()
+        process.start()
+        seconds = time.perf_counter() - start
+        if sampling.running:
+            sampling.stop()
+
+    server.terminate()
+
+    requests = sum(
+        crawler.stats.get_value("downloader/request_count", 0)
+        for crawler in crawlers
+    )
+    errors = sum(
+        crawler.stats.get_value("downloader/response_status_count/404", 0)
+        + crawler.stats.get_value("downloader/exception_count", 0)
+        for crawler in crawlers
+    )
+    samples = sampler.samples or [0]
+    print(
+        f"{args.shows} shows, {args.shows * args.episodes} episodes\n"
+        f"Crawl time:        {seconds:10.2f} s\n"
+        f"Requests:          {requests:10}"
+        f" ({errors} 404s or exceptions)\n"
+        f"Requests/s:        {requests / seconds:10.1f}\n"
+        f"Items:             {items:10}\n"
+        f"Queue depth:       {max(samples):10} max,"
+        f" {sum(samples) / len(samples):.1f} mean\n"
+        f"Peak memory (RSS): "
+        f"{resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:10.1f}"
+        f" MiB"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Benchmark for the spiders' callbacks on the captured pages in
+`benchmarks/fixtures` (see `benchmarks.fixtures`).
+
+Run with:
+    python -m benchmarks.parse [SPIDER ...]
+
+For each callback (and for the tickets and ZDF page parsers on their
+own), reports the time per page, items per second and the peak memory
+allocated while parsing a page.
+
+To compare two commits, save the results of one of them with
+`--output` and pass that file to the other with `--compare`.
+"""
+
+import argparse
+import asyncio
+import inspect
+import json
+import pathlib
+import platform
+import time
+import tracemalloc
+from typing import Callable, Iterable
+
+import scrapy
+from scrapy.http import Response
+from scrapy.spiderloader import SpiderLoader
+from scrapy.utils.project import get_project_settings
+
+from talkshowguests.spiders.utils_tvtickets import (
+    TicketsPageCache,
+    get_tickets_index,
+)
+from talkshowguests.spiders.utils_zdf import get_episodes_from_zdf_page
+
+from .fixtures import FIXTURES_DIR, Fixture, load_fixtures
+
+
+class FixtureTicketsPageCache(TicketsPageCache):
+    """Serves tickets pages from the fixtures instead of downloading."""
+
+    def __init__(self, spider: scrapy.Spider, fixtures: list[Fixture]):
+        super().__init__(spider)
+        self.fixtures = {fixture.url: fixture for fixture in fixtures}
+
+    async def _download(self, url: str) -> Response | None:
+        fixture = self.fixtures.get(url)
+        return fixture.response() if fixture else None
+
+
+class Benchmark:
+    """Parses each of `fixtures` with a new response per call."""
+
+    def __init__(
+        self,
+        name: str,
+        fixtures: list[Fixture],
+        parse: Callable[[Fixture, Response], Iterable],
+    ):
+        self.name = name
+        self.fixtures = fixtures
+        self.parse = parse
+
+    def run(self, repeat: int) -> dict:
+        loop = asyncio.new_event_loop()
+        try:
+            best = None
+            for _ in range(repeat):
+                seconds, items = self._run_once(loop)
+                best = seconds if best is None else min(best, seconds)
+            peak = self._measure_peak(loop)
+        finally:
+            loop.close()
+        return {
+            "pages": len(self.fixtures),
+            "items": items,
+            "ms_per_page": best / len(self.fixtures) * 1e3,
+            "items_per_sec": items / best if best else 0.0,
+            "peak_kib_per_page": peak / 1024,
+        }
+
+    def _run_once(self, loop) -> tuple[float, int]:
+        seconds = 0.0
+        items = 0
+        for fixture in self.fixtures:
+            response = fixture.response()
+            start = time.perf_counter()
+            outputs = self._collect(loop, self.parse(fixture, response))
+            seconds += time.perf_counter() - start
+            items += sum(
+                not isinstance(o, scrapy.Request) for o in outputs)
+        return seconds, items
+
+    def _measure_peak(self, loop) -> int:
+        """Mean of the peak memory allocated per page."""
+        peaks = []
+        tracemalloc.start()
+        try:
+            for fixture in self.fixtures:
+                response = fixture.response()
+                tracemalloc.reset_peak()
+                baseline, _ = tracemalloc.get_traced_memory()
+                self._collect(loop, self.parse(fixture, response))
+                _, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak - baseline)
+        finally:
+            tracemalloc.stop()
+        return sum(peaks) // len(peaks)
+
+    @staticmethod
+    def _collect(loop, result) -> list:
+        if inspect.isasyncgen(result):
+            async def collect():
+                return [o async for o in result]
+            return loop.run_until_complete(collect())
+        return list(result or [])
+
+
+def _new_spider(spidercls, tickets_fixtures: list[Fixture]) -> scrapy.Spider:
+    spider = spidercls()
+    if hasattr(spider, "tickets_pages"):
+        spider.tickets_pages = FixtureTicketsPageCache(
+            spider, tickets_fixtures)
+    return spider
+
+
+def get_benchmarks(
+    fixtures: dict[str, list[Fixture]],
+    spider_names: list[str],
+) -> list[Benchmark]:
+    spider_loader = SpiderLoader.from_settings(get_project_settings())
+    benchmarks = []
+    for spider_name in spider_names:
+        spidercls = spider_loader.load(spider_name)
+        tickets_fixtures = [
+            f for f in fixtures[spider_name] if f.callback is None]
+
+        def parse_with_callback(
+                fixture, response, spidercls=spidercls,
+                tickets_fixtures=tickets_fixtures,
+        ):
+            # A new spider per page, so that each page also pays for
+            # indexing the tickets pages, as the first episode of a
+            # crawl does:
+            spider = _new_spider(spidercls, tickets_fixtures)
+            return getattr(spider, fixture.callback)(response)
+
+        callbacks = sorted({
+            f.callback for f in fixtures[spider_name] if f.callback})
+        for callback in callbacks:
+            benchmarks.append(Benchmark(
+                f"{spider_name}.{callback}",
+                [f for f in fixtures[spider_name] if f.callback == callback],
+                parse_with_callback,
+            ))
+
+        locations = dict(
+            getattr(spidercls, "tickets_pages_and_locations", []))
+
+        def parse_tickets_page(fixture, response, locations=locations):
+            return get_tickets_index(
+                response, locations[fixture.url]).values()
+
+        if tickets_fixtures:
+            benchmarks.append(Benchmark(
+                f"{spider_name}:get_tickets_index",
+                tickets_fixtures,
+                parse_tickets_page,
+            ))
+
+        if getattr(spidercls, "script_cache", False) is None:
+            # ZDF spider
+            benchmarks.append(Benchmark(
+                f"{spider_name}:get_episodes_from_zdf_page",
+                [f for f in fixtures[spider_name] if f.callback == "parse"],
+                lambda fixture, response:
+                    get_episodes_from_zdf_page(response),
+            ))
+    return benchmarks
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "spiders",
+        nargs="*",
+        help="Spiders whose callbacks to benchmark "
+             "(default: all with captured pages)",
+    )
+    parser.add_argument(
+        "--fixtures-dir",
+        type=pathlib.Path,
+        default=FIXTURES_DIR,
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--output",
+        type=pathlib.Path,
+        help="Write the results to this JSON file",
+    )
+    parser.add_argument(
+        "--compare",
+        type=pathlib.Path,
+        help="Compare with results previously written with --output",
+    )
+    args = parser.parse_args()
+
+    fixtures = load_fixtures(args.fixtures_dir)
+    if not fixtures:
+        parser.error(
+            f"No captured pages in {args.fixtures_dir}, "
+            f"run `python -m benchmarks.fixtures` first"
+        )
+    spider_names = args.spiders or list(fixtures)
+    for spider_name in spider_names:
+        if spider_name not in fixtures:
+            parser.error(f"No captured pages for {spider_name}")
+
+    synthetic = [
+        spider_name for spider_name in spider_names
+        if any(fixture.synthetic for fixture in fixtures[spider_name])
+    ]
+    if synthetic:
+        print(
+            f"Made-up pages (see benchmarks.synthetic) for: "
+            f"{', '.join(synthetic)}\n"
+        )
+
+    previous = {}
+    if args.compare:
+        with args.compare.open("r") as f:
+            previous = json.load(f)["results"]
+
+    results = {}
+    for benchmark in get_benchmarks(fixtures, spider_names):
+        result = results[benchmark.name] = benchmark.run(args.repeat)
+        line = (
+            f"{benchmark.name:45} "
+            f"{result['pages']:4} pages "
+            f"{result['ms_per_page']:9.3f} ms/page "
+            f"{result['items_per_sec']:10.1f} items/s "
+            f"{result['peak_kib_per_page']:9.1f} KiB peak"
+        )
+        if benchmark.name in previous:
+            before = previous[benchmark.name]["ms_per_page"]
+            line += f" {(result['ms_per_page'] / before - 1) * 100:+6.1f}%"
+        print(line)
+
+    if args.output:
+        with args.output.open("w") as f:
+            json.dump(
+                {
+                    "python": platform.python_version(),
+                    "scrapy": scrapy.__version__,
+                    "synthetic": synthetic,
+                    "results": results,
+                },
+                f,
+                indent=2,
+            )
+
+
+if __name__ == "__main__":
+    main()
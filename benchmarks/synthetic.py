@@ -0,0 +1,342 @@
+"""
+Synthetic stand-ins for the shows' websites, for building a corpus
+with `python -m benchmarks.fixtures --synthetic` where the real
+websites can't be reached.
+
+The pages are made up: They only have the elements and the structure
+that the spiders look for, wrapped in made-up navigation and footers,
+ZDF pages with made-up flight data, and guests with placeholder names.
+Numbers measured on them don't tell how fast real pages are parsed,
+only how the same made-up pages compare across commits.
+
+The pages only depend on `TODAY` and the seed, so building the corpus
+again gives the same pages.
+"""
+
+import datetime
+import json
+import random
+
+from scrapy.http import HtmlResponse
+
+
+TODAY = datetime.date(2026, 10, 18)
+"""Date that the episodes are scheduled around"""
+
+_FIRST_NAMES = [
+    "Anna", "Ben", "Clara", "David", "Emma", "Felix", "Greta", "Hannes",
+    "Ida", "Jonas", "Karla", "Lukas", "Mia", "Noah", "Olga", "Paul",
+]
+_LAST_NAMES = [
+    "Beispiel", "Muster", "Mustermann", "Musterfrau", "Probe",
+    "Platzhalter", "Exempel", "Vorlage", "von Beispiel", "Muster-Probe",
+]
+_PARTIES = [
+    "SPD", "CDU", "CSU", "FDP", "AfD", "BSW", "Die Linke", "B'90/Grüne",
+    "Bündnis 90/Die Grünen",
+]
+_ROLES = [
+    "Journalistin", "Autor", "Ökonomin", "Militärexperte",
+    "Arzt & Wissenschaftsjournalist", "Beispiel-Zeitung",
+    "Muster-Rundfunk", "Ministerin", "Ministerpräsident von Musterland",
+    "Fraktionsvorsitzende", "Generalsekretär", "Institut für Beispiele",
+]
+_TOPICS = [
+    "Thema A", "Thema B: Streit um das Beispiel",
+    "Wie geht es weiter mit Thema C?", "Thema D in der Krise",
+]
+_MONTHS = [
+    "JAN", "FEB", "MÄR", "APR", "MAI", "JUN", "JUL", "AUG", "SEP", "OKT",
+    "NOV", "DEZ",
+]
+
+
+def _guests(rnd: random.Random, n: int) -> list[str]:
+    """Guests in the styles "Name (Aff)" and "Name, PARTY (Role)"."""
+    guests = []
+    for _ in range(n):
+        name = f"{rnd.choice(_FIRST_NAMES)} {rnd.choice(_LAST_NAMES)}"
+        style = rnd.random()
+        if style < 0.3:
+            guests.append(
+                f"{name}, {rnd.choice(_PARTIES)} ({rnd.choice(_ROLES)})")
+        elif style < 0.6:
+            guests.append(f"{name} ({rnd.choice(_PARTIES)})")
+        else:
+            guests.append(f"{name} ({rnd.choice(_ROLES)})")
+    return guests
+
+
+def _join(guests: list[str]) -> str:
+    return ", ".join(guests[:-1]) + " und " + guests[-1]
+
+
+def _episode_dates(weekdays: set[int], past: int, upcoming: int):
+    """Dates of `past + upcoming` episodes, the latest first."""
+    dates = []
+    day = TODAY + datetime.timedelta(days=7 * upcoming)
+    while len(dates) < past + upcoming:
+        if day.weekday() in weekdays:
+            dates.append(day)
+        day -= datetime.timedelta(days=1)
+    return dates
+
+
+def _html_page(host: str, title: str, content: str, links=150) -> str:
+    """`content` with a head, navigation and footer."""
+    head = "".join(
+        f'<link rel="stylesheet" href="/resources/css/{i}.css">'
+        f'<script src="/resources/js/{i}.js" defer></script>'
+        for i in range(10)
+    )
+    nav = "".join(
+        f'<li class="navItem"><a href="https://{host}/rubrik-{i}/index.html"'
+        f' title="Rubrik {i}" class="navLink">Rubrik {i}</a></li>'
+        for i in range(links)
+    )
+    footer = "".join(
+        f'<li><a href="https://{host}/service/{i}.html">Service {i}</a></li>'
+        for i in range(links // 2)
+    )
+    tracking = ";".join(
+        f"window.dataLayer.push({{'event':'view','id':{i}}})"
+        for i in range(links)
+    )
+    return (
+        f'<!DOCTYPE html><html lang="de"><head><meta charset="utf-8">'
+        f"<title>{title}</title>{head}</head><body>"
+        f'<header><nav class="mainNav"><ul>{nav}</ul></nav></header>'
+        f'<main id="content">{content}</main>'
+        f'<footer><ul class="footerLinks">{footer}</ul></footer>'
+        f"<script>{tracking}</script></body></html>"
+    )
+
+
+def _tickets_page(rnd: random.Random, title: str, dates) -> str:
+    events = "".join(
+        '<div class="termin"><div class="date_wrapper">'
+        f'<span class="day">{d.day}</span>'
+        f'<span class="month">{_MONTHS[d.month - 1]}</span>'
+        f'<span class="year">{d.year}</span>'
+        '<span class="termin_abholen"> 17:30 Uhr Einlass </span>'
+        '<span class="btn_tickets_buchen_info">'
+        f'{rnd.choice(["BUCHEN", "AUSGEBUCHT"])}</span></div>'
+        '<p class="hinweis">Mindestalter 16 Jahre.</p></div>'
+        for d in dates
+    )
+    return _html_page(
+        "tvtickets.de", title, f"<h1>{title}</h1>{events}", links=60)
+
+
+def _maischberger_pages(rnd: random.Random) -> dict[str, str]:
+    base = "https://www.daserste.de/information/talk/maischberger/sendung"
+    dates = _episode_dates({1, 2}, past=28, upcoming=4)
+    pages = {}
+    teasers = []
+    for i, date in enumerate(dates):
+        url = f"{base}/maischberger-{i}.html"
+        prefix = rnd.choice(["Zu Gast: ", "Mit ", ""])
+        guest_list = _join(_guests(rnd, rnd.randint(4, 7)))
+        teasers.append(
+            f'<div class="teaser"><h4 class="headline"><a href="{url}">'
+            f"maischberger am {date:%d.%m.%Y}</a></h4>"
+            f'<p class="teasertext"><a href="{url}">'
+            f"{prefix}{guest_list}\xa0|\xa0</a></p></div>"
+        )
+        paragraphs = "".join(
+            f"<p>{rnd.choice(_TOPICS)}: {_join(_guests(rnd, 2))}</p>"
+            for _ in range(2)
+        )
+        pages[url] = _html_page(
+            "www.daserste.de",
+            f"maischberger am {date:%d.%m.%Y}",
+            f'<div class="con">{paragraphs}'
+            f"<p>Es kommentieren: {_join(_guests(rnd, 3))}</p></div>",
+        )
+    pages[f"{base}/index.html"] = _html_page(
+        "www.daserste.de", "Sendungen - maischberger", "".join(teasers))
+    pages["https://tvtickets.de/maischberger-ber.php"] = _tickets_page(
+        rnd, "maischberger Berlin", dates[:6:2])
+    pages["https://tvtickets.de/maischberger-koe.php"] = _tickets_page(
+        rnd, "maischberger Köln", dates[1:6:2])
+    return pages
+
+
+def _caren_miosga_pages(rnd: random.Random) -> dict[str, str]:
+    base = "https://www.daserste.de/information/talk/caren-miosga/sendung"
+    dates = _episode_dates({6}, past=20, upcoming=2)
+    pages = {}
+    teasers = []
+    for i, date in enumerate(dates):
+        url = f"{base}/miosga-{i}.html"
+        topic = rnd.choice(_TOPICS)
+        teasers.append(
+            f'<h3 class="ressort">Sendung vom {date:%d.%m.%Y}</h3>'
+            f'<div class="teaser"><h4 class="headline"><a href="{url}">'
+            f"{topic}</a></h4></div>"
+        )
+        infotexts = []
+        for guest in _guests(rnd, rnd.randint(3, 5)):
+            name, _, affiliation = guest.partition(" (")
+            if rnd.random() < 0.7:
+                name += f"\xa0|\xa0{affiliation.rstrip(')')}"
+            infotexts.append(f'<p class="infotext">{name}</p>')
+        pages[url] = _html_page(
+            "www.daserste.de",
+            f"{topic} - Caren Miosga",
+            f"<h1>{topic}</h1>"
+            f'<div class="infoBroadcastDateBox"><p>So {date:%d.%m.%y}'
+            f' | 21:45 Uhr</p></div>'
+            f'<div class="mediaLeft">{"".join(infotexts)}</div>',
+        )
+    pages[f"{base}/index.html"] = _html_page(
+        "www.daserste.de", "Alle Sendungen - Caren Miosga", "".join(teasers))
+    pages["https://tvtickets.de/carenmiosga"] = _tickets_page(
+        rnd, "Caren Miosga", dates[:4])
+    return pages
+
+
+def _hart_aber_fair_pages(rnd: random.Random) -> dict[str, str]:
+    sections = []
+    for i, date in enumerate(_episode_dates({0}, past=6, upcoming=2)):
+        sections.append(
+            '<div class="sectionA"><h2 class="conHeadline">Sendung vom '
+            f'{date:%d.%m.%Y}</h2><div class="teaser"><a href="/daserste/'
+            f'hartaberfair/sendungen/haf-{i}.html" '
+            f'title="{rnd.choice(_TOPICS)}"></a><p class="programInfo">'
+            'Mo | 21:00 Uhr</p><p class="teasertext">Darüber wird mit den '
+            "Gästen diskutiert.</p></div></div>"
+        )
+        boxes = "".join(
+            f'<div class="box"><h4 class="headline">{guest}</h4></div>'
+            for guest in _guests(rnd, rnd.randint(4, 6))
+        )
+        sections.append(
+            '<div class="sectionA"><h2 class="conHeadline">Gäste</h2>'
+            f"{boxes}</div>"
+        )
+    return {
+        "https://www1.wdr.de/daserste/hartaberfair/index.html": _html_page(
+            "www1.wdr.de", "hart aber fair", "".join(sections)),
+    }
+
+
+def _flight_script(obj, i: int) -> str:
+    """<script> element with React server components flight data"""
+    text = json.dumps(json.dumps(obj, ensure_ascii=False), ensure_ascii=False)
+    return f'<script>self.__next_f.push([1,"{i:x}:{text[1:-1]}"])</script>'
+
+
+def _zdf_page(rnd: random.Random, episodes: list[dict], next_episode: dict,
+              scripts=250) -> str:
+    """ZDF page with the episodes where `utils_zdf` looks for them."""
+    elements = [
+        _flight_script(["$", "div", None, {
+            "className": f"c-{i}",
+            "children": [
+                ["$", "a", f"link-{i}-{j}", {
+                    "href": f"/rubrik/{i}/{j}",
+                    "children": f"Rubrik {j}",
+                    "tracking": {"id": f"{i}-{j}", "position": j},
+                }]
+                for j in range(rnd.randint(5, 40))
+            ],
+        }], i)
+        for i in range(scripts)
+    ]
+    seasons = [
+        {"episodes": {"nodes": episodes[i:i + 40]}}
+        for i in range(0, len(episodes), 40)
+    ]
+    elements.insert(scripts // 2, _flight_script([{"result": {"data": {
+        "smartCollectionByCanonical": {"seasons": {"nodes": seasons}},
+    }}}], scripts))
+    elements.insert(scripts // 3, _flight_script(
+        ["$L3a", ["$", "$L3b", None, {"children": [
+            "$", "$L3e", None, {"collection": next_episode}]}]],
+        scripts + 1,
+    ))
+    return (
+        "<!DOCTYPE html><html><head><title>ZDF</title></head><body>"
+        '<div id="root"></div>' + "".join(elements) + "</body></html>"
+    )
+
+
+def _markus_lanz_episode(rnd: random.Random, date) -> dict:
+    names = [
+        guest.split(" (")[0] for guest in _guests(rnd, rnd.randint(3, 5))]
+    return {
+        "editorialDate": f"{date.isoformat()}T22:45:00.000Z",
+        "teaser": {"description": rnd.choice(_TOPICS)},
+        "longInfoText": {"items": [{"paragraph": [
+            {"text": "Zu Gast: " + ", ".join(
+                f"<strong>{name}</strong>" for name in names)},
+            *(
+                {"text": f"<b>{name}</b> spricht über "
+                         f"{rnd.choice(_TOPICS)}."}
+                for name in names
+            ),
+        ]}]},
+    }
+
+
+def _maybrit_illner_episode(rnd: random.Random, date) -> dict:
+    guests = "".join(
+        f"<li>{guest}</li>" for guest in _guests(rnd, rnd.randint(4, 6)))
+    return {
+        "editorialDate": f"{date.isoformat()}T22:15:00.000Z",
+        "teaser": {"description": rnd.choice(_TOPICS)},
+        "longInfoText": {"items": [{"paragraph": [
+            {"text": "Zu Gast bei Maybrit Illner:"},
+            {"text": f"<ul>{guests}</ul>"},
+            {"text": f"„maybrit illner“ mit dem Thema "
+                     f"„{rnd.choice(_TOPICS)}“ am Donnerstag, "
+                     f"um 22:15 Uhr im ZDF."},
+        ]}]},
+    }
+
+
+def get_pages(seed=0) -> dict[str, str]:
+    """Return the synthetic pages of all spiders by URL."""
+    rnd = random.Random(seed)
+    pages = {
+        **_maischberger_pages(rnd),
+        **_caren_miosga_pages(rnd),
+        **_hart_aber_fair_pages(rnd),
+    }
+    for url, make_episode, weekdays, past in [
+        ("https://www.zdf.de/talk/markus-lanz-114",
+         _markus_lanz_episode, {1, 2, 3}, 120),
+        ("https://www.zdf.de/talk/maybrit-illner-128",
+         _maybrit_illner_episode, {3}, 40),
+    ]:
+        dates = _episode_dates(weekdays, past=past, upcoming=1)
+        pages[url] = _zdf_page(
+            rnd,
+            [make_episode(rnd, date) for date in dates[1:]],
+            make_episode(rnd, dates[0]),
+        )
+    return pages
+
+
+class SyntheticSiteMiddleware:
+    """
+    Downloader middleware that responds with the synthetic pages
+    instead of downloading, and with 404 for all other URLs.
+    """
+
+    def __init__(self):
+        self.pages = get_pages()
+
+    def process_request(self, request, spider):
+        body = self.pages.get(request.url)
+        if body is None:
+            return HtmlResponse(
+                request.url, status=404, body=b"", request=request)
+        return HtmlResponse(
+            request.url,
+            headers={"Content-Type": "text/html; charset=utf-8"},
+            body=body.encode(),
+            encoding="utf-8",
+            request=request,
+        )
@@ -40,6 +40,15 @@ chown "$CRON_USER":"$HOST_GID" /var/log/cron.log
 # so dump them to a file before starting cron:
 printenv | grep -v "no_proxy" | sed 's/^/export /' > /etc/talkshowguests_env
 
+if [ "${CRAWL_MODE:-cron}" = "serve" ]; then
+    # Keep a single talkshowguests process running that crawls
+    # according to CRAWL_SCHEDULE by itself instead of starting
+    # a new process from cron every time:
+    echo "Running talkshowguests in serve mode."
+    exec setpriv --reuid="$HOST_UID" --regid="$HOST_GID" --clear-groups \
+        /run.sh serve --schedule "$CRAWL_SCHEDULE"
+fi
+
 # Start cron in the foreground
 # (as root; hostuser is specified in the cron job)
 cron -f
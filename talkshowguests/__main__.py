@@ -1,33 +1,63 @@
 import argparse
-import copy
-import datetime
-import json
 import os
 import pathlib
+import sys
 
-from dotenv import load_dotenv
-from scrapy.crawler import CrawlerProcess
-from scrapy.utils.project import get_project_settings
+from . import profiling
 
-from .items import TalkshowItem
-from .reports.telegram import report_episodes_telegram
+# Before the other imports, so that they are profiled as well:
+profiling.start_if_requested(sys.argv)
+
+from dotenv import load_dotenv  # noqa: E402
+from scrapy.crawler import CrawlerProcess  # noqa: E402
+from scrapy.utils.project import get_project_settings  # noqa: E402
+
+from .history import load_history, update_history  # noqa: E402
+from .metrics import (  # noqa: E402
+    StageTimer,
+    get_run_metrics,
+    get_spider_stats,
+    write_metrics,
+)
+from .pipelines import HistoryDiffPipeline  # noqa: E402
+from .reports import report_episodes  # noqa: E402
+from .serve import serve  # noqa: E402
+from .shards import crawl_in_workers  # noqa: E402
 
 
 def main():
+    profiling.current_stage = "main"
     parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=["crawl", "serve"],
+        default="crawl",
+        help="'crawl' (default) crawls and reports once, "
+             "'serve' keeps running and crawls according to "
+             "--schedule",
+    )
     parser.add_argument(
         "--crawler-results",
         type=pathlib.Path,
-        help="Output json (jsonlines) path for crawler results",
-        default="latest-result.jsonlines",
+        help="Optional output json (jsonlines) path for crawler results",
+        default=None,
     )
     parser.add_argument(
         "--history-file",
         type=pathlib.Path,
-        help="Path to a history file of previously "
+        help="Path to a history database (SQLite) of previously "
              "reported talkshows. Will be created if it "
              "does not yet exist.",
-        default=pathlib.Path("history.json"),
+        default=pathlib.Path("history.sqlite"),
+    )
+    parser.add_argument(
+        "--import-history",
+        type=pathlib.Path,
+        help="Path to a history.json file from older versions. "
+             "Will be imported when the history database "
+             "is created.",
+        default=None,
     )
     parser.add_argument(
         "--report-telegram",
@@ -36,86 +66,160 @@ def main():
              "Requires the following environment variables: "
              "TELEGRAM_API_TOKEN, TELEGRAM_CHAT_ID",
     )
+    parser.add_argument(
+        "--cache-dir",
+        type=pathlib.Path,
+        help="Directory for caches that persist across crawls. "
+             "Defaults to the .scrapy directory.",
+        default=None,
+    )
+    archive_group = parser.add_mutually_exclusive_group()
+    archive_group.add_argument(
+        "--record-responses",
+        type=pathlib.Path,
+        help="Record all responses to archives in this directory",
+        default=None,
+    )
+    archive_group.add_argument(
+        "--replay-responses",
+        type=pathlib.Path,
+        help="Replay responses from archives in this directory "
+             "(recorded with --record-responses) instead of "
+             "accessing the network",
+        default=None,
+    )
+    parser.add_argument(
+        "--metrics-dir",
+        type=pathlib.Path,
+        help="Write metrics of each run to talkshowguests.prom "
+             "(Prometheus textfile) and metrics.jsonl in this directory",
+        default=None,
+    )
+    parser.add_argument(
+        "--profile",
+        nargs="?",
+        const=pathlib.Path("."),
+        type=pathlib.Path,
+        metavar="DIR",
+        help="Profile the run and write profile.folded (for flame "
+             "graphs) and profile.txt (summary) to DIR "
+             "(default: current directory)",
+        default=None,
+    )
+    parser.add_argument(
+        "--schedule",
+        help="Cron expression for 'serve', or 'adaptive' to crawl each "
+             "show often shortly before its episodes air and rarely "
+             "otherwise. "
+             "Defaults to the CRAWL_SCHEDULE environment variable "
+             "or '*/20 * * * *'.",
+        default=None,
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="Split the spiders among this many processes "
+             "to crawl on several cores (default: 1). "
+             "Not supported for 'serve'.",
+        default=1,
+    )
     args = parser.parse_args()
+    if args.profile and args.command == "serve":
+        parser.error("--profile is not supported for 'serve'")
+    if args.workers > 1 and args.command == "serve":
+        parser.error("--workers is not supported for 'serve'")
+    if args.workers < 1:
+        parser.error("--workers must be at least 1")
 
     # Environment variables can be either passed as regular
     # environment variables or as a .env file in the same
     # folder:
     load_dotenv()
 
-    settings = get_project_settings()
-    settings.set("FEED_FORMAT", "jsonlines")
-    settings.set("FEED_URI", str(args.crawler_results))
-    # Clear previous results because 'jsonlines' seems to append:
-    args.crawler_results.unlink(missing_ok=True)
-
-    process = CrawlerProcess(settings)
-    for spider in process.spider_loader.list():
-        process.crawl(spider)
-    process.start()
-
-    with open(args.crawler_results, "r") as f:
-        crawler_results = [TalkshowItem(**json.loads(line)) for line in f]
-
-    if args.history_file.exists():
-        with args.history_file.open("r") as f:
-            history = json.load(f)
+    settings = get_crawl_settings(args)
+
+    if args.command == "serve":
+        serve(
+            settings=settings,
+            args=args,
+            schedule=(
+                args.schedule
+                or os.getenv("CRAWL_SCHEDULE")
+                or "*/20 * * * *"
+            ),
+        )
+        return
+
+    history = load_history(args.history_file, args.import_history)
+
+    if args.crawler_results:
+        # Clear previous results because 'jsonlines' seems to append:
+        args.crawler_results.unlink(missing_ok=True)
+
+    timer = StageTimer()
+    if args.workers > 1:
+        with timer.stage("crawl"):
+            episodes_to_report, spider_stats = crawl_in_workers(
+                settings, args.workers, history, args.crawler_results)
     else:
-        history: dict[str, dict] = dict()
-        # Keys: "talkshow_isodate, talkshow_name".
-        # Should contain TalkshowItem instances or equivalent
-        # dicts with an extra entry "reported_on" and
-        # optionally "update_history" and "diff_keys" if one
-        # episode was reported more than once due to updates.
-
-    episodes_to_report = []
-    for episode in crawler_results:
-        date = datetime.datetime.fromisoformat(episode["isodate"])
-        if not date.tzinfo:
-            date = date.replace(tzinfo=datetime.timezone.utc)
-        if (datetime.datetime.now(datetime.timezone.utc) - date).days > 0:
-            # Date is in the past
-            continue
-        ep_key = f"{episode["isodate"]}, {episode["name"]}"
-        if ep_key in history:
-            if episode.eq_with_ignore(history[ep_key]):
-                # We've already reported on this episode:
-                continue
-            # Don't skip if any content changed!
-            if "update_history" not in episode:
-                episode["update_history"] = []
-            # Copy episode from history to this episode's
-            # update_history.
-            # Using the episode from history instead of this
-            # episode has the advantage that "reported_on"
-            # will be included.
-            episode["update_history"].append(
-                copy.deepcopy(history[ep_key])
-            )
-            episode["diff_keys"] = episode.get_diff_keys(history[ep_key])
-
-        episodes_to_report.append(episode)
-
-    if args.report_telegram:
-        api_token = os.getenv("TELEGRAM_API_TOKEN")
-        chat_id = os.getenv("TELEGRAM_CHAT_ID")
-        if api_token and chat_id:
-            report_episodes_telegram(
-                episodes=episodes_to_report,
-                api_token=api_token,
-                chat_id=chat_id,
-            )
-        else:
-            raise ValueError(
-                "Missing TELEGRAM_API_TOKEN or TELEGRAM_CHAT_ID"
-            )
-
-    if episodes_to_report:
-        history.update({
-            # Merge key into one str because json doesn't like tuple keys:
-            f"{ep["isodate"]}, {ep["name"]}":
-            {"reported_on": datetime.datetime.now().isoformat(), **ep}
-            for ep in episodes_to_report
-        })
-        with args.history_file.open("w") as f:
-            json.dump(history, f, indent=2, ensure_ascii=False)
+        process = CrawlerProcess(settings)
+        # Keep references to the crawlers to collect their results later:
+        crawlers = [
+            process.create_crawler(spider)
+            for spider in process.spider_loader.list()
+        ]
+        for crawler in crawlers:
+            process.crawl(crawler)
+        with timer.stage("crawl"):
+            process.start()
+        episodes_to_report = HistoryDiffPipeline.get_episodes_to_report(
+            crawlers)
+        spider_stats = get_spider_stats(crawlers)
+
+    with timer.stage("report"):
+        report_episodes(episodes_to_report, args.report_telegram)
+    with timer.stage("update_history"):
+        update_history(history, episodes_to_report)
+    history.close()
+
+    if args.metrics_dir:
+        write_metrics(
+            get_run_metrics(spider_stats, timer.seconds),
+            args.metrics_dir,
+        )
+
+    if profiling.profiler:
+        profiling.profiler.stop()
+        print(profiling.profiler.write(str(args.profile)))
+
+
+def get_crawl_settings(args: argparse.Namespace):
+    settings = get_project_settings()
+    # For HistoryDiffPipeline:
+    settings.set("HISTORY_FILE", str(args.history_file))
+    if args.crawler_results:
+        settings.set("FEED_FORMAT", "jsonlines")
+        settings.set("FEED_URI", str(args.crawler_results))
+    if args.cache_dir:
+        settings.set(
+            "CONDITIONAL_CACHE_DIR",
+            str(args.cache_dir / "conditionalcache"),
+        )
+        settings.set(
+            "ZDF_SCRIPT_CACHE_DIR",
+            str(args.cache_dir / "zdfscriptcache"),
+        )
+        settings.set("HTTPCACHE_DIR", str(args.cache_dir / "httpcache"))
+    archive_dir = args.record_responses or args.replay_responses
+    if archive_dir:
+        settings.set(
+            "RESPONSE_ARCHIVE_MODE",
+            "record" if args.record_responses else "replay",
+        )
+        settings.set("RESPONSE_ARCHIVE_DIR", str(archive_dir))
+        # Record and replay complete pages, not 304s or cached pages,
+        # and all of them:
+        settings.set("CONDITIONAL_CACHE_ENABLED", False)
+        settings.set("HTTPCACHE_ENABLED", False)
+        settings.set("INCREMENTAL_CRAWL_ENABLED", False)
+    return settings
@@ -0,0 +1,352 @@
+"""
+Diffing crawler results against the history of previously
+reported episodes.
+"""
+
+import datetime
+import json
+import pathlib
+import sqlite3
+
+from .items import TalkshowItem
+
+
+def _delta(old: dict, new: dict) -> dict:
+    """Field-level difference that turns `old` into `new`."""
+    return {
+        "set": {
+            key: value
+            for key, value in new.items()
+            if key not in old or old[key] != value
+        },
+        "unset": [key for key in old if key not in new],
+    }
+
+
+def _apply_delta(old: dict, delta: dict) -> dict:
+    new = {**old, **delta["set"]}
+    for key in delta["unset"]:
+        del new[key]
+    return new
+
+
+def _flatten_update_history(entry: dict) -> list[dict]:
+    """
+    Turn an entry of a history.json from older versions, whose
+    "update_history" contains the previous entry (including that
+    one's "update_history" and so on), into a list of states,
+    oldest first.
+    """
+    states = []
+    for previous in entry.get("update_history", []):
+        states.extend(_flatten_update_history(previous))
+    states.append({
+        key: value
+        for key, value in entry.items()
+        if key != "update_history"
+    })
+    return states
+
+
+class HistoryStore:
+    """
+    Previously reported episodes in an SQLite database,
+    keyed by (isodate, name).
+
+    Each entry is a TalkshowItem as a dict with an extra entry
+    "reported_on" and optionally "diff_keys" if the episode was
+    reported more than once due to updates.
+
+    Earlier reported versions of an episode are kept as revisions,
+    each stored as a delta against the revision before it
+    (see `get_revisions`).
+
+    Also indexes the episode pages that were crawled, by URL, and when
+    each spider last crawled all of its pages (see
+    `IncrementalCrawlSpiderMiddleware`).
+    """
+
+    def __init__(self, history_file: pathlib.Path):
+        self.db = sqlite3.connect(history_file)
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS episodes ("
+            " isodate TEXT NOT NULL,"
+            " name TEXT NOT NULL,"
+            " data TEXT NOT NULL,"
+            " fingerprint TEXT,"
+            " field_fingerprints TEXT,"
+            " PRIMARY KEY (isodate, name)"
+            ") WITHOUT ROWID"
+        )
+        columns = {
+            row[1] for row in self.db.execute("PRAGMA table_info(episodes)")
+        }
+        if "fingerprint" not in columns:
+            # Database from before fingerprints were stored
+            self.db.execute(
+                "ALTER TABLE episodes ADD COLUMN fingerprint TEXT")
+            self.db.execute(
+                "ALTER TABLE episodes ADD COLUMN field_fingerprints TEXT")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS revisions ("
+            " isodate TEXT NOT NULL,"
+            " name TEXT NOT NULL,"
+            " revision INTEGER NOT NULL,"
+            " delta TEXT NOT NULL,"
+            " PRIMARY KEY (isodate, name, revision)"
+            ") WITHOUT ROWID"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS pages ("
+            " url TEXT PRIMARY KEY,"
+            " isodate TEXT NOT NULL,"
+            " name TEXT NOT NULL,"
+            " fingerprint TEXT NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS full_crawls ("
+            " spider TEXT PRIMARY KEY,"
+            " crawled_on TEXT NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self.db.commit()
+
+    def get(self, isodate: str, name: str) -> dict | None:
+        """Return the latest reported version of an episode."""
+        row = self.db.execute(
+            "SELECT data FROM episodes WHERE isodate = ? AND name = ?",
+            (isodate, name),
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def get_fingerprints(
+        self,
+        isodate: str,
+        name: str,
+    ) -> tuple[str, dict[str, str]] | None:
+        """
+        Return the fingerprint and field fingerprints of the latest
+        reported version of an episode (see `TalkshowItem`).
+        """
+        row = self.db.execute(
+            "SELECT fingerprint, field_fingerprints, data FROM episodes"
+            " WHERE isodate = ? AND name = ?",
+            (isodate, name),
+        ).fetchone()
+        if row is None:
+            return None
+        fingerprint, field_fingerprints, data = row
+        if fingerprint is None:
+            # Entry from before fingerprints were stored
+            field_fingerprints = TalkshowItem.get_field_fingerprints(
+                json.loads(data))
+            return (
+                TalkshowItem.get_fingerprint(field_fingerprints),
+                field_fingerprints,
+            )
+        return fingerprint, json.loads(field_fingerprints)
+
+    def get_isodates(self, name: str) -> list[str]:
+        """Return the dates of all reported episodes of a show."""
+        return [
+            row[0] for row in self.db.execute(
+                "SELECT isodate FROM episodes WHERE name = ?", (name,))
+        ]
+
+    def get_page(self, url: str) -> dict | None:
+        """
+        Return the "isodate", "name" and "fingerprint" of the episode
+        that was last scraped from a page.
+        """
+        row = self.db.execute(
+            "SELECT isodate, name, fingerprint FROM pages WHERE url = ?",
+            (url,),
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(["isodate", "name", "fingerprint"], row))
+
+    def add_pages(self, pages: dict[str, dict]):
+        """Add or update pages by URL, see `get_page`."""
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO pages"
+                " (url, isodate, name, fingerprint) VALUES (?, ?, ?, ?)",
+                [
+                    (url, p["isodate"], p["name"], p["fingerprint"])
+                    for url, p in pages.items()
+                ],
+            )
+
+    def get_last_full_crawl(self, spider: str) -> datetime.datetime | None:
+        row = self.db.execute(
+            "SELECT crawled_on FROM full_crawls WHERE spider = ?",
+            (spider,),
+        ).fetchone()
+        return datetime.datetime.fromisoformat(row[0]) if row else None
+
+    def set_last_full_crawl(self, spider: str, crawled_on: datetime.datetime):
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO full_crawls (spider, crawled_on)"
+                " VALUES (?, ?)",
+                (spider, crawled_on.isoformat()),
+            )
+
+    def get_revisions(self, isodate: str, name: str) -> list[dict]:
+        """Return all reported versions of an episode, oldest first."""
+        states = []
+        state = {}
+        for (delta,) in self.db.execute(
+                "SELECT delta FROM revisions"
+                " WHERE isodate = ? AND name = ? ORDER BY revision",
+                (isodate, name),
+        ):
+            state = _apply_delta(state, json.loads(delta))
+            states.append(state)
+        return states
+
+    def _add_revisions(self, isodate: str, name: str, states: list[dict]):
+        """Append `states` as revisions and make the last one current."""
+        num_revisions, = self.db.execute(
+            "SELECT COUNT(*) FROM revisions WHERE isodate = ? AND name = ?",
+            (isodate, name),
+        ).fetchone()
+        current = self.get(isodate, name)
+        if current is not None and num_revisions == 0:
+            # Entry from before revisions were stored: Keep it as the
+            # first revision, i.e. as a delta against nothing
+            states = [current, *states]
+            previous = {}
+        else:
+            previous = current or {}
+        deltas = []
+        for state in states:
+            deltas.append(_delta(previous, state))
+            previous = state
+        self.db.executemany(
+            "INSERT INTO revisions (isodate, name, revision, delta)"
+            " VALUES (?, ?, ?, ?)",
+            [
+                (
+                    isodate,
+                    name,
+                    num_revisions + i,
+                    json.dumps(delta, ensure_ascii=False),
+                )
+                for i, delta in enumerate(deltas)
+            ],
+        )
+        field_fingerprints = TalkshowItem.get_field_fingerprints(previous)
+        self.db.execute(
+            "INSERT INTO episodes"
+            " (isodate, name, data, fingerprint, field_fingerprints)"
+            " VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT (isodate, name) DO UPDATE SET"
+            " data = excluded.data,"
+            " fingerprint = excluded.fingerprint,"
+            " field_fingerprints = excluded.field_fingerprints",
+            (
+                isodate,
+                name,
+                json.dumps(previous, ensure_ascii=False),
+                TalkshowItem.get_fingerprint(field_fingerprints),
+                json.dumps(field_fingerprints),
+            ),
+        )
+
+    def upsert(self, episodes: list[dict]):
+        with self.db:  # one transaction
+            for ep in episodes:
+                self._add_revisions(ep["isodate"], ep["name"], [dict(ep)])
+
+    def import_json(self, history_json: pathlib.Path):
+        """
+        Import a history.json file from older versions.
+        Episodes that are already in the database are kept.
+        Nested "update_history" entries are imported as revisions.
+        """
+        with history_json.open("r") as f:
+            history: dict[str, dict] = json.load(f)
+        with self.db:
+            for ep in history.values():
+                if self.get(ep["isodate"], ep["name"]) is None:
+                    self._add_revisions(
+                        ep["isodate"],
+                        ep["name"],
+                        _flatten_update_history(ep),
+                    )
+
+    def close(self):
+        self.db.close()
+
+
+def load_history(
+    history_file: pathlib.Path,
+    import_json: pathlib.Path | None = None,
+) -> HistoryStore:
+    """
+    Open the history database, which will be created if it doesn't
+    exist yet. In that case, previous history from `import_json`
+    is imported, if given.
+    """
+    is_new = not history_file.exists()
+    history = HistoryStore(history_file)
+    if is_new and import_json and import_json.exists():
+        history.import_json(import_json)
+    return history
+
+
+def is_past(isodate: str) -> bool:
+    """Whether an episode aired before today (UTC)."""
+    date = datetime.datetime.fromisoformat(isodate)
+    if not date.tzinfo:
+        date = date.replace(tzinfo=datetime.timezone.utc)
+    return (datetime.datetime.now(datetime.timezone.utc) - date).days > 0
+
+
+def get_episode_to_report(
+    episode: TalkshowItem,
+    history: HistoryStore,
+) -> TalkshowItem | None:
+    """
+    Return the episode if we haven't reported on it yet or if it
+    changed since, with "diff_keys" (and "guest_diff") added
+    in the latter case. Return None otherwise.
+    """
+    if is_past(episode["isodate"]):
+        return None
+    fingerprints = history.get_fingerprints(
+        episode["isodate"], episode["name"])
+    if fingerprints is not None:
+        fingerprint, field_fingerprints = fingerprints
+        if TalkshowItem.get_fingerprint(
+                TalkshowItem.get_field_fingerprints(episode)
+        ) == fingerprint:
+            # We've already reported on this episode:
+            return None
+        diff_keys = episode.get_diff_keys(field_fingerprints)
+        if not diff_keys:
+            # Only fields are missing that we've reported on before
+            return None
+        # Don't skip if any content changed!
+        # (The previous version is kept as a revision in the
+        # history.)
+        episode["diff_keys"] = diff_keys
+        if "guests" in diff_keys:
+            previous = history.get(episode["isodate"], episode["name"])
+            episode["guest_diff"] = episode.get_guest_diff(
+                previous.get("guests", []))
+    return episode
+
+
+def update_history(
+    history: HistoryStore,
+    episodes_to_report: list[TalkshowItem],
+):
+    reported_on = datetime.datetime.now().isoformat()
+    history.upsert([
+        {"reported_on": reported_on, **ep}
+        for ep in episodes_to_report
+    ])
@@ -0,0 +1,181 @@
+"""
+Cache of pages across crawls for Scrapy's HttpCacheMiddleware, with
+an expiry per kind of page.
+
+`PageKindCachePolicy` classifies each URL as one of the kinds in
+HTTPCACHE_PAGE_KINDS (e.g. "overview", "episode", "tickets") and keeps
+cached pages of each kind fresh for as long as HTTPCACHE_PAGE_KIND_TTLS
+says. Stale pages are revalidated with conditional GETs.
+Episode pages of episodes that have already aired never change, so
+they are never requested again once they are cached.
+
+`SqliteCacheStorage` stores the pages compressed in one SQLite database
+per spider and evicts the least recently used ones when the database
+grows beyond HTTPCACHE_MAX_SIZE_MB.
+"""
+
+import json
+import pathlib
+import re
+import sqlite3
+import time
+import zlib
+
+from scrapy.extensions.httpcache import rfc1123_to_epoch
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.httpobj import urlparse_cached
+from scrapy.utils.project import data_path
+
+from .history import is_past
+from .middlewares import EPISODE_ISODATE_KEY
+
+
+class PageKindCachePolicy:
+    """HTTPCACHE_POLICY with a TTL per kind of page."""
+
+    def __init__(self, settings):
+        self.ignore_schemes = settings.getlist("HTTPCACHE_IGNORE_SCHEMES")
+        self.page_kinds = [
+            (re.compile(pattern), kind)
+            for pattern, kind in settings.getlist("HTTPCACHE_PAGE_KINDS")
+        ]
+        self.ttls: dict[str, float | None] = settings.getdict(
+            "HTTPCACHE_PAGE_KIND_TTLS")
+
+    def get_page_kind(self, request) -> str:
+        """
+        Return the kind of page that `request` is for, "past_episode"
+        for pages of episodes that have already aired, or "other".
+        """
+        kind = next(
+            (
+                kind for pattern, kind in self.page_kinds
+                if pattern.search(request.url)
+            ),
+            "other",
+        )
+        if kind == "episode":
+            isodate = (
+                request.meta.get("talkshow_data", {}).get("isodate")
+                or request.meta.get(EPISODE_ISODATE_KEY)
+            )
+            if isodate and is_past(isodate):
+                return "past_episode"
+        return kind
+
+    def should_cache_request(self, request) -> bool:
+        return urlparse_cached(request).scheme not in self.ignore_schemes
+
+    def should_cache_response(self, response, request) -> bool:
+        return response.status == 200
+
+    def is_cached_response_fresh(self, cachedresponse, request) -> bool:
+        # TTLs in seconds, None for pages that never change
+        ttl = self.ttls.get(self.get_page_kind(request), 0)
+        if ttl is None:
+            return True
+        # (HttpCacheMiddleware adds a Date header if the server didn't)
+        date = rfc1123_to_epoch(cachedresponse.headers.get("Date"))
+        if date is not None and time.time() - date < ttl:
+            return True
+        # Revalidate:
+        if etag := cachedresponse.headers.get("ETag"):
+            request.headers.setdefault("If-None-Match", etag)
+        if last_modified := cachedresponse.headers.get("Last-Modified"):
+            request.headers.setdefault("If-Modified-Since", last_modified)
+        return False
+
+    def is_cached_response_valid(self, cachedresponse, response, request):
+        return response.status == 304
+
+
+class SqliteCacheStorage:
+    """HTTPCACHE_STORAGE in a size-bounded SQLite database per spider."""
+
+    def __init__(self, settings):
+        self.cache_dir = data_path(settings["HTTPCACHE_DIR"], createdir=True)
+        self.max_size = int(
+            settings.getfloat("HTTPCACHE_MAX_SIZE_MB") * 1024 * 1024)
+        self.db: sqlite3.Connection | None = None
+
+    def open_spider(self, spider):
+        self._fingerprinter = spider.crawler.request_fingerprinter
+        self.db = sqlite3.connect(
+            pathlib.Path(self.cache_dir, f"{spider.name}.sqlite"))
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " url TEXT NOT NULL,"
+            " status INTEGER NOT NULL,"
+            " headers TEXT NOT NULL,"
+            " body BLOB NOT NULL,"
+            " accessed_on REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self.db.commit()
+
+    def close_spider(self, spider):
+        self._evict(spider)
+        self.db.close()
+
+    def _key(self, request) -> str:
+        return self._fingerprinter.fingerprint(request).hex()
+
+    def retrieve_response(self, spider, request):
+        key = self._key(request)
+        row = self.db.execute(
+            "SELECT url, status, headers, body FROM responses"
+            " WHERE key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        url, status, headers, body = row
+        with self.db:
+            self.db.execute(
+                "UPDATE responses SET accessed_on = ? WHERE key = ?",
+                (time.time(), key),
+            )
+        headers = Headers(json.loads(headers))
+        body = zlib.decompress(body)
+        respcls = responsetypes.from_args(headers=headers, url=url, body=body)
+        return respcls(url=url, headers=headers, status=status, body=body)
+
+    def store_response(self, spider, request, response):
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO responses"
+                " (key, url, status, headers, body, accessed_on)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    self._key(request),
+                    response.url,
+                    response.status,
+                    json.dumps({
+                        k.decode("latin-1"): [v.decode("latin-1") for v in vs]
+                        for k, vs in response.headers.items()
+                    }),
+                    zlib.compress(response.body),
+                    time.time(),
+                ),
+            )
+
+    def _evict(self, spider):
+        """Remove the least recently used responses beyond max_size."""
+        size = 0
+        evict = []
+        for key, entry_size in self.db.execute(
+                "SELECT key, length(body) + length(headers) FROM responses"
+                " ORDER BY accessed_on DESC"
+        ):
+            size += entry_size
+            if size > self.max_size:
+                evict.append((key,))
+        if not evict:
+            return
+        spider.logger.info(f"Evicting {len(evict)} responses from cache")
+        with self.db:
+            self.db.executemany("DELETE FROM responses WHERE key = ?", evict)
+        # Give the space back:
+        self.db.execute("VACUUM")
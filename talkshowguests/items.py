@@ -3,15 +3,21 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/items.html
 
+import dataclasses
+import functools
+import hashlib
+import json
 import re
+import sys
 
 import scrapy
+from itemadapter import ItemAdapter
 
 
 _COMPARE_IGNORE_KEYS = {
-    "reported_on",  # added to dict in __main__.py
-    "update_history",  # same, if episode was updated
-    "diff_keys",  # same
+    "reported_on",  # added to dict in history.py
+    "diff_keys",  # same, if episode was updated
+    "guest_diff",  # same
 }
 
 _GUEST_LIST_AFFILIATION_KEYWORDS = {
@@ -35,15 +41,113 @@ _GUEST_LIST_AFFILIATION_KEYWORDS = {
 """Used to distinguish between affiliation and guest name"""
 
 
-class GuestItem(scrapy.Item):
-    name: str = scrapy.Field()
-    affiliation: str = scrapy.Field()
+_GUEST_LIST_TOKENS = re.compile(r"[()]|, |(?= und )")
+"""Parentheses and separators in guest lists"""
 
-    def __lt__(self, other):
-        return (
-            self["name"] + self["affiliation"]
-            < other["name"] + other["affiliation"]
-        )
+
+def _split_guest_list(s: str) -> list[str]:
+    """
+    Split a guest list at ", " and " und " outside of parentheses.
+    " und " only counts as a separator if no more commas follow.
+
+    Single pass over parentheses and separators only.
+    """
+    parts = []
+    start = 0
+    parens = 0
+    last_comma = s.rfind(",")
+    for m in _GUEST_LIST_TOKENS.finditer(s):
+        i = m.start()
+        if i < start:
+            # Within a separator we've already split at
+            continue
+        token = m.group()
+        if token == "(":
+            parens += 1
+        elif token == ")":
+            parens -= 1
+        elif parens != 0:
+            continue
+        elif token == ", ":
+            parts.append(s[start:i].strip())
+            start = i + 2
+        elif last_comma < i + 5 < len(s):
+            # " und ", the last separator
+            parts.append(s[start:i].strip())
+            start = i + 5
+    if start < len(s):
+        parts.append(s[start:].strip())
+    return parts
+
+
+def to_json_value(item):
+    """`default` for `json.dumps` to serialize (nested) items."""
+    return ItemAdapter(item).asdict()
+
+
+def _fingerprint(value) -> str:
+    # Canonical JSON, so that equal values have equal hashes
+    # regardless of the order of dict keys:
+    return hashlib.sha256(json.dumps(
+        value,
+        default=to_json_value,
+        ensure_ascii=False,
+        separators=(",", ":"),
+        sort_keys=True,
+    ).encode()).hexdigest()
+
+
+_GUEST_PATTERN = re.compile(
+    r"^(?P<name>[^\(,]+?)"
+    r"(?:\s+\((?P<paren_affiliation>[^)]+)\))?"
+    r"(?:,\s*(?P<comma_affiliation>[^\(]+)"
+    r"(?:\s+\((?P<paren_in_comma_affiliation>[^\)]+)\))?"
+    r")?$"
+)
+
+
+@functools.lru_cache(maxsize=4096)
+def _parse_guest_text(text: str) -> "GuestItem":
+    """
+    See `GuestItem.from_text`.
+
+    Cached, because we see the same guests on every crawl
+    (and in `talkshowguests serve`, the cache is kept between crawls).
+    """
+    m = _GUEST_PATTERN.match(text)
+    if m:
+        name = m["name"]
+        affiliation = m["paren_affiliation"] or ""
+        if m["paren_affiliation"] and m["comma_affiliation"]:
+            affiliation += ", " + m["comma_affiliation"] or ""
+        elif m["comma_affiliation"]:
+            affiliation = m["comma_affiliation"] or ""
+            if m["paren_in_comma_affiliation"]:
+                affiliation += f", {m["paren_in_comma_affiliation"]}"
+    else:
+        name = text
+        affiliation = ""
+    return GuestItem(
+        name=GuestItem._strip_text(name),
+        affiliation=GuestItem._strip_text(affiliation),
+    )
+
+
+@dataclasses.dataclass(frozen=True, slots=True, order=True)
+class GuestItem:
+    """
+    Unlike the other items, guests are immutable values, so that equal
+    guests are deduplicated and the same guest can be shared between
+    episodes (and the cache of `from_text`).
+    Scrapy supports dataclasses as items, so feeds export them as usual.
+    """
+    name: str
+    affiliation: str
+
+    def __post_init__(self):
+        # The same names and affiliations appear over and over
+        object.__setattr__(self, "name", sys.intern(self.name))
+        object.__setattr__(self, "affiliation", sys.intern(self.affiliation))
 
     @staticmethod
     def from_text(text: str) -> "GuestItem":
@@ -57,30 +161,12 @@ class GuestItem(scrapy.Item):
         - "FIRSTNAME LASTNAME (AFFILIATION 1), AFFILIATION 2" (Illner...)
         - "FIRSTNAME LASTNAME, AFFILIATION 1 (AFFILIATION 2)" (Maischberger...)
         """
-        m = re.match(
-            r"^(?P<name>[^\(,]+?)"
-            r"(?:\s+\((?P<paren_affiliation>[^)]+)\))?"
-            r"(?:,\s*(?P<comma_affiliation>[^\(]+)"
-            r"(?:\s+\((?P<paren_in_comma_affiliation>[^\)]+)\))?"
-            r")?$",
-            text
-        )
-        if m:
-            name = m["name"]
-            affiliation = m["paren_affiliation"] or ""
-            if m["paren_affiliation"] and m["comma_affiliation"]:
-                affiliation += ", " + m["comma_affiliation"] or ""
-            elif m["comma_affiliation"]:
-                affiliation = m["comma_affiliation"] or ""
-                if m["paren_in_comma_affiliation"]:
-                    affiliation += f", {m["paren_in_comma_affiliation"]}"
-        else:
-            name = text
-            affiliation = ""
-        return GuestItem(
-            name=GuestItem._strip_text(name),
-            affiliation=GuestItem._strip_text(affiliation),
-        )
+        return _parse_guest_text(text)
+
+    @staticmethod
+    def cache_info():
+        """Hits and misses of the cache used by `from_text`."""
+        return _parse_guest_text.cache_info()
 
     @staticmethod
     def _strip_text(text: str) -> str:
@@ -110,31 +196,60 @@ class TalkshowItem(scrapy.Item):
     # Optional fields used only for items that we've already
     # reported on:
     reported_on = scrapy.Field()
-    update_history = scrapy.Field()
     diff_keys = scrapy.Field()
+    guest_diff = scrapy.Field()
 
-    def eq_with_ignore(self, other):
-        """Same as `==`, but ignores irrelevant keys."""
+    @staticmethod
+    def get_field_fingerprints(episode) -> dict[str, str]:
+        """
+        Hash of each field of a TalkshowItem or an equivalent dict
+        (e.g. from the history), ignoring irrelevant keys.
+        Equal fields have equal hashes.
+        """
+        return {
+            key: _fingerprint(value)
+            for key, value in episode.items()
+            if key not in _COMPARE_IGNORE_KEYS
+        }
+
+    @staticmethod
+    def get_fingerprint(field_fingerprints: dict[str, str]) -> str:
+        """Hash of a whole episode, see `get_field_fingerprints`."""
+        return _fingerprint(field_fingerprints)
+
+    def get_diff_keys(self, other_field_fingerprints: dict[str, str]):
+        """
+        Keys of this item whose values differ from those of another
+        episode, given that episode's field fingerprints.
+        """
         # (We cannot override __eq__ because then we'd also
         # have to override __hash__ and that doesn't seem to
         # work well with scrapy Items since hash() appears to
         # be called before the item's fields are initialized.)
-        for key in set(self.keys()) - _COMPARE_IGNORE_KEYS:
-            if key not in other:
-                return False
-            if self[key] != other[key]:
-                return False
-        return True
-
-    def get_diff_keys(self, other):
         return [
             key
-            for key in set(self.keys()) - _COMPARE_IGNORE_KEYS
-            if (key in self and key not in other)
-            or (key in other and key not in self)
-            or self[key] != other[key]
+            for key, fingerprint
+            in TalkshowItem.get_field_fingerprints(self).items()
+            if other_field_fingerprints.get(key) != fingerprint
         ]
 
+    def get_guest_diff(self, other_guests: list[dict]) -> dict:
+        """Guests that were added and removed compared to `other_guests`."""
+        guests = {(g["name"], g["affiliation"]): g for g in self["guests"]}
+        other_guests = {
+            (g["name"], g["affiliation"]): g for g in other_guests
+        }
+        return {
+            "added": [
+                guest for key, guest in guests.items()
+                if key not in other_guests
+            ],
+            "removed": [
+                guest for key, guest in other_guests.items()
+                if key not in guests
+            ],
+        }
+
     @staticmethod
     def from_guest_list(
         guest_list: str,
@@ -165,45 +280,13 @@ class TalkshowItem(scrapy.Item):
         Béla Réthy (Sportjournalist), Dagmar Rosenfeld (Media Pioneer)
         und Sonja Zekri (Süddeutsche Zeitung)."
         """
-        def smart_split(s):
-            # With help from ChatGPT :S
-            parts = []
-            buf = ''
-            parens = 0
-            i = 0
-            while i < len(s):
-                if s[i] == '(':
-                    parens += 1
-                elif s[i] == ')':
-                    parens -= 1
-                # Check for ", " outside parentheses
-                if parens == 0 and s[i:i+2] == ', ':
-                    parts.append(buf.strip())
-                    buf = ''
-                    i += 2
-                    continue
-                # Check for " und " outside parentheses
-                elif parens == 0 and s[i:i+5] == ' und ' and i + 5 < len(s):
-                    # Peek ahead to ensure it's the last separator
-                    # (no more commas)
-                    if ',' not in s[i+5:]:
-                        parts.append(buf.strip())
-                        buf = ''
-                        i += 5
-                        continue
-                buf += s[i]
-                i += 1
-            if buf:
-                parts.append(buf.strip())
-            return parts
-
         def is_affiliation(item: str):
             return (
                 item.split("(")[0].strip()
                 in _GUEST_LIST_AFFILIATION_KEYWORDS
             )
 
-        guest_list_split = smart_split(guest_list)
+        guest_list_split = _split_guest_list(guest_list)
 
         # Using a dict with keys only as an ordered set so we don't have
         # to sort and thus mangle the order of the guests.
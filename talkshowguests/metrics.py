@@ -0,0 +1,297 @@
+"""
+Metrics of a run: what each spider did and how long each stage took,
+written as a Prometheus textfile (for node_exporter's textfile
+collector) and appended as a JSON line to metrics.jsonl.
+
+Per-spider metrics are collected in Scrapy's stats while crawling
+(see `CallbackMetricsMiddleware` and `DownloadLatencyStats`).
+"""
+
+import contextlib
+import datetime
+import json
+import os
+import pathlib
+import time
+
+from scrapy import Request, signals
+
+from . import profiling
+
+
+class CallbackMetricsMiddleware:
+    """
+    Counts the responses and items of each callback and the time spent
+    in it, in the stats "callback_count/<callback>",
+    "callback_items/<callback>" and "callback_time/<callback>".
+
+    The time of async callbacks includes waiting for the downloads
+    they await (e.g. tickets pages).
+    Callbacks that `TalkshowguestsSpiderMiddleware` replays aren't
+    run, so they aren't counted either.
+    """
+
+    def __init__(self, stats):
+        self.stats = stats
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.stats)
+
+    def _callback_name(self, response) -> str:
+        callback = response.request.callback
+        return callback.__name__ if callback else "parse"
+
+    def _add(self, name: str, start: float, output=None):
+        self.stats.inc_value(
+            f"callback_time/{name}", time.perf_counter() - start)
+        if output is not None and not isinstance(output, Request):
+            self.stats.inc_value(f"callback_items/{name}")
+
+    def process_spider_output(self, response, result, spider):
+        name = self._callback_name(response)
+        self.stats.inc_value(f"callback_count/{name}")
+        it = iter(result)
+        while True:
+            start = time.perf_counter()
+            try:
+                i = next(it)
+            except StopIteration:
+                self._add(name, start)
+                return
+            self._add(name, start, i)
+            yield i
+
+    async def process_spider_output_async(self, response, result, spider):
+        # Same as above for callbacks that are async generators
+        name = self._callback_name(response)
+        self.stats.inc_value(f"callback_count/{name}")
+        it = aiter(result)
+        while True:
+            start = time.perf_counter()
+            try:
+                i = await anext(it)
+            except StopAsyncIteration:
+                self._add(name, start)
+                return
+            self._add(name, start, i)
+            yield i
+
+
+class DownloadLatencyStats:
+    """
+    Adds percentiles of the download latency to the stats
+    ("download_latency/p50" etc., in seconds).
+    """
+
+    PERCENTILES = [50, 90, 99]
+
+    def __init__(self, stats):
+        self.stats = stats
+        self.latencies: list[float] = []
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        ext = cls(crawler.stats)
+        crawler.signals.connect(
+            ext.response_received, signal=signals.response_received)
+        crawler.signals.connect(
+            ext.spider_closed, signal=signals.spider_closed)
+        return ext
+
+    def response_received(self, response, request, spider):
+        if "download_latency" in request.meta:
+            self.latencies.append(request.meta["download_latency"])
+
+    def spider_closed(self, spider):
+        if not self.latencies:
+            return
+        latencies = sorted(self.latencies)
+        for percentile in self.PERCENTILES:
+            index = min(
+                len(latencies) - 1,
+                len(latencies) * percentile // 100,
+            )
+            self.stats.set_value(
+                f"download_latency/p{percentile}", latencies[index])
+        self.stats.set_value("download_latency/max", latencies[-1])
+
+
+class StageTimer:
+    """
+    Measures the duration of the stages of a run
+    (and labels the samples of `profiling` with them).
+    """
+
+    def __init__(self):
+        self.seconds: dict[str, float] = {}
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        previous_stage = profiling.current_stage
+        profiling.current_stage = name
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.seconds[name] = time.perf_counter() - start
+            profiling.current_stage = previous_stage
+
+
+def get_spider_stats(crawlers) -> dict[str, dict]:
+    """Return the stats of finished crawlers by spider name."""
+    return {
+        crawler.spider.name: crawler.stats.get_stats()
+        for crawler in crawlers
+    }
+
+
+def get_run_metrics(
+    spider_stats: dict[str, dict],
+    stage_seconds: dict[str, float],
+    next_crawls: dict[str, datetime.datetime] | None = None,
+) -> dict:
+    """
+    Collect the metrics of each spider from its stats (see
+    `get_spider_stats`), the duration of the stages of a run ("crawl",
+    "report", ...) and, for 'serve', when each spider will crawl next.
+    """
+    spiders = {}
+    for spider_name, stats in spider_stats.items():
+        spider_metrics = {
+            "requests": stats.get("downloader/request_count", 0),
+            "responses": stats.get("downloader/response_count", 0),
+            "download_errors": stats.get("downloader/exception_count", 0),
+            "items": stats.get("item_scraped_count", 0),
+            "items_dropped": stats.get("item_dropped_count", 0),
+            "errbacks": stats.get("errback_count", 0),
+            "seconds": stats.get("elapsed_time_seconds", 0.0),
+            "history_diff_seconds": stats.get("history_diff/time", 0.0),
+            "download_latency": {},
+            "callbacks": {},
+        }
+        for key, value in stats.items():
+            kind, _, name = key.partition("/")
+            if kind == "download_latency":
+                spider_metrics["download_latency"][name] = value
+            elif kind in ("callback_count", "callback_items", "callback_time"):
+                callback = spider_metrics["callbacks"].setdefault(
+                    name, {"count": 0, "items": 0, "seconds": 0.0})
+                callback[{
+                    "callback_count": "count",
+                    "callback_items": "items",
+                    "callback_time": "seconds",
+                }[kind]] = value
+        spiders[spider_name] = spider_metrics
+    metrics = {
+        "timestamp": datetime.datetime.now().isoformat(),
+        "stages": stage_seconds,
+        "spiders": spiders,
+    }
+    if next_crawls is not None:
+        metrics["next_crawls"] = {
+            name: t.isoformat() for name, t in next_crawls.items()
+        }
+    return metrics
+
+
+def _prometheus_lines(metrics: dict) -> list[str]:
+    lines = []
+
+    def add(name: str, help_text: str, samples: list[tuple[dict, float]]):
+        lines.append(f"# HELP talkshowguests_{name} {help_text}")
+        lines.append(f"# TYPE talkshowguests_{name} gauge")
+        for labels, value in samples:
+            label_text = ",".join(
+                f'{key}="{value}"' for key, value in labels.items())
+            if label_text:
+                label_text = f"{{{label_text}}}"
+            lines.append(f"talkshowguests_{name}{label_text} {value}")
+
+    spiders = metrics["spiders"]
+    add(
+        "last_run_timestamp_seconds",
+        "When the last run finished",
+        [({}, datetime.datetime.fromisoformat(
+            metrics["timestamp"]).timestamp())],
+    )
+    add(
+        "stage_seconds",
+        "Duration of each stage of the last run",
+        [({"stage": stage}, s) for stage, s in metrics["stages"].items()],
+    )
+    for key, help_text in [
+        ("requests", "Requests sent"),
+        ("responses", "Responses received"),
+        ("download_errors", "Requests that failed"),
+        ("items", "Items scraped"),
+        ("items_dropped", "Items dropped by pipelines (duplicates)"),
+        ("errbacks", "Failed requests handled by yielding partial items"),
+        ("seconds", "Duration of the crawl"),
+        ("history_diff_seconds", "Time spent diffing against the history"),
+    ]:
+        add(
+            f"spider_{key}",
+            f"{help_text} per spider",
+            [({"spider": name}, m[key]) for name, m in spiders.items()],
+        )
+    add(
+        "download_latency_seconds",
+        "Download latency percentiles per spider",
+        [
+            (
+                {
+                    "spider": name,
+                    # "p90" -> "0.9", "max" -> "1"
+                    "quantile": (
+                        str(int(key[1:]) / 100) if key.startswith("p")
+                        else "1"
+                    ),
+                },
+                value,
+            )
+            for name, m in spiders.items()
+            for key, value in m["download_latency"].items()
+        ],
+    )
+    for key, help_text in [
+        ("count", "Responses parsed"),
+        ("items", "Items yielded"),
+        ("seconds", "Time spent"),
+    ]:
+        add(
+            f"callback_{key}",
+            f"{help_text} per spider callback",
+            [
+                ({"spider": name, "callback": callback}, c[key])
+                for name, m in spiders.items()
+                for callback, c in m["callbacks"].items()
+            ],
+        )
+    if "next_crawls" in metrics:
+        add(
+            "next_crawl_timestamp_seconds",
+            "When each spider will crawl next",
+            [
+                ({"spider": name}, datetime.datetime.fromisoformat(
+                    t).timestamp())
+                for name, t in metrics["next_crawls"].items()
+            ],
+        )
+    return lines
+
+
+def write_metrics(metrics: dict, metrics_dir: pathlib.Path):
+    """
+    Write `metrics` to talkshowguests.prom and append them
+    to metrics.jsonl in `metrics_dir`.
+    """
+    metrics_dir.mkdir(parents=True, exist_ok=True)
+    prom_file = metrics_dir / "talkshowguests.prom"
+    # Replace atomically, so that the collector never reads
+    # a partially written file:
+    tmp_file = prom_file.with_suffix(".prom.tmp")
+    tmp_file.write_text("\n".join(_prometheus_lines(metrics)) + "\n")
+    os.replace(tmp_file, prom_file)
+    with (metrics_dir / "metrics.jsonl").open("a") as f:
+        f.write(json.dumps(metrics, ensure_ascii=False) + "\n")
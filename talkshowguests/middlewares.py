@@ -3,98 +3,454 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
-from scrapy import signals
+import copy
+import datetime
+import hashlib
+import json
+import pathlib
+import shelve
+import zipfile
 
-# useful for handling different item types with a single interface
-from itemadapter import ItemAdapter
+from scrapy import Request, signals
+from scrapy.exceptions import IgnoreRequest, NotConfigured
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.project import data_path
+from scrapy.utils.request import request_from_dict
+
+from talkshowguests.history import HistoryStore, is_past
+from talkshowguests.items import TalkshowItem, to_json_value
+
+
+UNCHANGED_FLAG = "unchanged"
+"""Response flag for pages that are the same as in the previous crawl"""
+
+EPISODE_ISODATE_KEY = "episode_isodate"
+"""Request meta key for the date of the episode on a page, if known from
+the index of episode pages (see `IncrementalCrawlSpiderMiddleware`)"""
+
+
+def _open_cache(settings, spider, suffix: str) -> shelve.Shelf:
+    cache_dir = data_path(settings["CONDITIONAL_CACHE_DIR"], createdir=True)
+    return shelve.open(
+        str(pathlib.Path(cache_dir, f"{spider.name}-{suffix}"))
+    )
+
+
+def _close_cache(cache: shelve.Shelf, seen_keys: set[str], reason: str):
+    """
+    Close a cache opened with `_open_cache` after removing the entries
+    that weren't used in the crawl (e.g. pages that aren't linked
+    anymore), so that it doesn't grow with every crawl.
+    Entries are only removed after complete crawls.
+    """
+    if seen_keys and reason == "finished":
+        for key in set(cache.keys()) - seen_keys:
+            del cache[key]
+    cache.close()
 
 
 class TalkshowguestsSpiderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the spider middleware does not modify the
-    # passed objects.
+    """
+    Replays the output of a callback from the previous crawl if the
+    response is flagged as unchanged by
+    `TalkshowguestsDownloaderMiddleware`, so the callback doesn't have
+    to parse the same page again.
+
+    Callbacks are generators, so not iterating over their result
+    means that they don't run at all.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.outputs: shelve.Shelf | None = None
+        self.seen_keys: set[str] = set()
 
     @classmethod
     def from_crawler(cls, crawler):
-        # This method is used by Scrapy to create your spiders.
-        s = cls()
+        if not crawler.settings.getbool("CONDITIONAL_CACHE_ENABLED"):
+            raise NotConfigured
+        s = cls(crawler)
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
         return s
 
-    def process_spider_input(self, response, spider):
-        # Called for each response that goes through the spider
-        # middleware and into the spider.
+    def _output_key(self, response) -> str:
+        # The output of a callback depends on the response and on the
+        # data that previous callbacks passed on to it:
+        # (E.g., the tickets pages are requested once per episode.)
+        request = response.request
+        return (
+            self.crawler.request_fingerprinter.fingerprint(request).hex()
+            + hashlib.sha256(json.dumps(
+                [
+                    request.meta.get("talkshow_data"),
+                    request.cb_kwargs,
+                    request.callback.__name__ if request.callback else None,
+                ],
+                default=to_json_value,
+                sort_keys=True,
+            ).encode()).hexdigest()
+        )
 
-        # Should return None or raise an exception.
-        return None
+    def _should_replay(self, response, key) -> bool:
+        return (
+            UNCHANGED_FLAG in response.flags
+            # Set by spiders whose callbacks depend on more than
+            # just the response:
+            and not response.meta.get("dont_replay")
+            and key in self.outputs
+        )
 
-    def process_spider_output(self, response, result, spider):
-        # Called with the results returned from the Spider, after
-        # it has processed the response.
+    def _replay(self, key, spider):
+        for kind, obj in self.outputs[key]:
+            if kind == "request":
+                yield request_from_dict(obj, spider=spider)
+            else:
+                yield obj
 
-        # Must return an iterable of Request, or item objects.
+    def _record(self, outputs: list | None, i, spider) -> list | None:
+        """Add `i` to `outputs` or return None if not cacheable."""
+        if outputs is None:
+            return None
+        if isinstance(i, Request):
+            try:
+                outputs.append(("request", i.to_dict(spider=spider)))
+            except ValueError:
+                # E.g. lambdas as callbacks cannot be serialized
+                return None
+        else:
+            outputs.append(("item", copy.deepcopy(i)))
+        return outputs
+
+    def _store(self, key, outputs: list | None):
+        if outputs is not None:
+            self.outputs[key] = outputs
+        else:
+            self.outputs.pop(key, None)
+
+    def process_spider_output(self, response, result, spider):
+        key = self._output_key(response)
+        self.seen_keys.add(key)
+        if self._should_replay(response, key):
+            spider.logger.debug(f"Replaying unchanged page: {response.url}")
+            yield from self._replay(key, spider)
+            return
+        outputs = []
         for i in result:
+            outputs = self._record(outputs, i, spider)
+            yield i
+        self._store(key, outputs)
+
+    async def process_spider_output_async(self, response, result, spider):
+        # Same as above for callbacks that are async generators
+        key = self._output_key(response)
+        self.seen_keys.add(key)
+        if self._should_replay(response, key):
+            spider.logger.debug(f"Replaying unchanged page: {response.url}")
+            for i in self._replay(key, spider):
+                yield i
+            return
+        outputs = []
+        async for i in result:
+            outputs = self._record(outputs, i, spider)
             yield i
+        self._store(key, outputs)
+
+    def spider_opened(self, spider):
+        self.outputs = _open_cache(self.crawler.settings, spider, "outputs")
+
+    def spider_closed(self, spider, reason):
+        _close_cache(self.outputs, self.seen_keys, reason)
+
+
+class IncrementalCrawlSpiderMiddleware:
+    """
+    Drops requests for the pages of episodes that have already aired
+    (they can never be reported) and gives requests for pages of
+    upcoming episodes that we already reported as they were a lower
+    priority, so that new pages are downloaded first.
+
+    The date of an episode is taken from the request's "talkshow_data"
+    or, for pages that were crawled before, from the index of episode
+    pages in the history. Pages from which a callback scraped exactly
+    one episode are added to that index.
+
+    To keep the index from going stale, each spider follows all links
+    at least every INCREMENTAL_FULL_CRAWL_HOURS. Pages of past episodes
+    are then requested last.
+    Requires the HISTORY_FILE setting.
+    """
+
+    UNCHANGED_PRIORITY = -1
+    """Added to the priority of pages that were reported as they were"""
+    PAST_PRIORITY = -2
+    """Added to the priority of pages of past episodes in full crawls"""
+
+    def __init__(self, crawler, history_file: pathlib.Path):
+        self.crawler = crawler
+        self.history_file = history_file
+        self.full_crawl_interval = datetime.timedelta(
+            hours=crawler.settings.getfloat("INCREMENTAL_FULL_CRAWL_HOURS"))
+        self.history: HistoryStore | None = None
+        self.full_crawl = False
+        self.pages: dict[str, dict] = {}
+        """Episode pages scraped in this crawl, by URL"""
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if (
+                not crawler.settings.getbool("INCREMENTAL_CRAWL_ENABLED")
+                or not crawler.settings.get("HISTORY_FILE")
+        ):
+            raise NotConfigured
+        s = cls(crawler, pathlib.Path(crawler.settings["HISTORY_FILE"]))
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def _filter(self, request, spider) -> Request | None:
+        """Return `request`, possibly with a lower priority, or None."""
+        page = self.history.get_page(request.url)
+        if page:
+            # For the HTTP cache policy:
+            request.meta[EPISODE_ISODATE_KEY] = page["isodate"]
+        isodate = (
+            request.meta.get("talkshow_data", {}).get("isodate")
+            or (page and page["isodate"])
+        )
+        if isodate is None:
+            return request
+        if is_past(isodate):
+            if self.full_crawl:
+                return request.replace(
+                    priority=request.priority + self.PAST_PRIORITY)
+            spider.logger.debug(f"Skipping page of past episode: {request}")
+            self.crawler.stats.inc_value("incremental/skipped")
+            return None
+        if page:
+            fingerprints = self.history.get_fingerprints(
+                page["isodate"], page["name"])
+            if fingerprints and fingerprints[0] == page["fingerprint"]:
+                self.crawler.stats.inc_value("incremental/deprioritized")
+                return request.replace(
+                    priority=request.priority + self.UNCHANGED_PRIORITY)
+        return request
 
-    def process_spider_exception(self, response, exception, spider):
-        # Called when a spider or process_spider_input() method
-        # (from other spider middleware) raises an exception.
+    def _index(self, response, items: list):
+        if len(items) != 1:
+            # Not an episode page (e.g. an overview of all episodes)
+            return
+        item = items[0]
+        page = {
+            "isodate": item["isodate"],
+            "name": item["name"],
+            "fingerprint": TalkshowItem.get_fingerprint(
+                TalkshowItem.get_field_fingerprints(item)),
+        }
+        for url in [response.url, *response.meta.get("redirect_urls", [])]:
+            self.pages[url] = page
 
-        # Should return either None or an iterable of Request or item objects.
-        pass
+    def process_spider_output(self, response, result, spider):
+        items = []
+        for i in result:
+            if isinstance(i, Request):
+                i = self._filter(i, spider)
+                if i is None:
+                    continue
+            else:
+                items.append(i)
+            yield i
+        self._index(response, items)
 
-    async def process_start(self, start):
-        # Called with an async iterator over the spider start() method or the
-        # maching method of an earlier spider middleware.
-        async for item_or_request in start:
-            yield item_or_request
+    async def process_spider_output_async(self, response, result, spider):
+        # Same as above for callbacks that are async generators
+        items = []
+        async for i in result:
+            if isinstance(i, Request):
+                i = self._filter(i, spider)
+                if i is None:
+                    continue
+            else:
+                items.append(i)
+            yield i
+        self._index(response, items)
 
     def spider_opened(self, spider):
-        spider.logger.info("Spider opened: %s" % spider.name)
+        self.history = HistoryStore(self.history_file)
+        last_full_crawl = self.history.get_last_full_crawl(spider.name)
+        self.full_crawl = (
+            last_full_crawl is None
+            or datetime.datetime.now() - last_full_crawl
+            >= self.full_crawl_interval
+        )
+        if self.full_crawl:
+            spider.logger.info("Following all links (full crawl)")
+
+    def spider_closed(self, spider, reason):
+        self.history.add_pages(self.pages)
+        if self.full_crawl and reason == "finished":
+            self.history.set_last_full_crawl(
+                spider.name, datetime.datetime.now())
+        self.history.close()
 
 
 class TalkshowguestsDownloaderMiddleware:
-    # Not all methods need to be defined. If a method is not defined,
-    # scrapy acts as if the downloader middleware does not modify the
-    # passed objects.
+    """
+    Persistent cache of body hashes.
+
+    Responses whose body is the same as in the previous crawl are
+    flagged as unchanged, so that `TalkshowguestsSpiderMiddleware` can
+    skip the callback. That includes pages that the HTTP cache (see
+    httpcache.py) served or revalidated with a conditional GET, which
+    is the only place where bodies and validators are stored.
+    """
+
+    def __init__(self, crawler):
+        self.crawler = crawler
+        self.responses: shelve.Shelf | None = None
+        self.seen_keys: set[str] = set()
 
     @classmethod
     def from_crawler(cls, crawler):
-        # This method is used by Scrapy to create your spiders.
-        s = cls()
+        if not crawler.settings.getbool("CONDITIONAL_CACHE_ENABLED"):
+            raise NotConfigured
+        s = cls(crawler)
         crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
         return s
 
-    def process_request(self, request, spider):
-        # Called for each request that goes through the downloader
-        # middleware.
-
-        # Must either:
-        # - return None: continue processing this request
-        # - or return a Response object
-        # - or return a Request object
-        # - or raise IgnoreRequest: process_exception() methods of
-        #   installed downloader middleware will be called
-        return None
+    def _key(self, request) -> str:
+        return self.crawler.request_fingerprinter.fingerprint(request).hex()
 
     def process_response(self, request, response, spider):
-        # Called with the response returned from the downloader.
+        if request.method != "GET" or response.status != 200:
+            return response
+        key = self._key(request)
+        self.seen_keys.add(key)
+        body_hash = hashlib.sha256(response.body).hexdigest()
+        if self.responses.get(key) == body_hash:
+            response.flags.append(UNCHANGED_FLAG)
+        else:
+            self.responses[key] = body_hash
+        return response
+
+    def spider_opened(self, spider):
+        self.responses = _open_cache(
+            self.crawler.settings, spider, "responses")
+
+    def spider_closed(self, spider, reason):
+        _close_cache(self.responses, self.seen_keys, reason)
+
+
+class ArchivedRequestError(IgnoreRequest):
+    """A request failed when it was recorded or was not recorded at all."""
+
 
-        # Must either;
-        # - return a Response object
-        # - return a Request object
-        # - or raise IgnoreRequest
+class ResponseArchiveDownloaderMiddleware:
+    """
+    Records all responses of a crawl to an archive, or replays a crawl
+    from such an archive without any network access
+    (RESPONSE_ARCHIVE_MODE "record" or "replay").
+
+    The archive of each spider is a zip file in RESPONSE_ARCHIVE_DIR
+    with one (compressed) entry per response, keyed by the request
+    fingerprint. Failed requests are recorded as well, so that
+    errbacks are called the same way when replaying.
+
+    This middleware sits right before the downloader, so redirects,
+    retries and decompression still happen as in a real crawl.
+    Disable HTTPCACHE_ENABLED and CONDITIONAL_CACHE_ENABLED when
+    recording or replaying, otherwise 304s are recorded and unchanged
+    pages aren't parsed.
+    """
+
+    def __init__(self, crawler, mode: str):
+        self.crawler = crawler
+        self.mode = mode
+        self.path: pathlib.Path | None = None
+        self.entries: dict[str, dict] = {}
+        self.bodies: dict[str, bytes] = {}
+        """Only used when recording"""
+        self.archive: zipfile.ZipFile | None = None
+        """Only used when replaying"""
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        mode = crawler.settings.get("RESPONSE_ARCHIVE_MODE")
+        if not mode:
+            raise NotConfigured
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Invalid RESPONSE_ARCHIVE_MODE: {mode}")
+        s = cls(crawler, mode)
+        crawler.signals.connect(s.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(s.spider_closed, signal=signals.spider_closed)
+        return s
+
+    def _key(self, request) -> str:
+        return self.crawler.request_fingerprinter.fingerprint(request).hex()
+
+    def process_request(self, request, spider):
+        if self.mode != "replay":
+            return None
+        entry = self.entries.get(self._key(request))
+        if entry is None:
+            raise ArchivedRequestError(f"Not in archive: {request.url}")
+        if "error" in entry:
+            raise ArchivedRequestError(
+                f"Recorded error: {entry['error']}")
+        headers = Headers(entry["headers"])
+        body = self.archive.read(entry["body"])
+        respcls = responsetypes.from_args(
+            headers=headers, url=entry["url"], body=body)
+        return respcls(
+            url=entry["url"],
+            status=entry["status"],
+            headers=headers,
+            body=body,
+            request=request,
+        )
+
+    def process_response(self, request, response, spider):
+        if self.mode == "record":
+            key = self._key(request)
+            self.entries[key] = {
+                "url": response.url,
+                "status": response.status,
+                "headers": {
+                    k.decode("latin-1"): [v.decode("latin-1") for v in vs]
+                    for k, vs in response.headers.items()
+                },
+                "body": f"{key}.body",
+            }
+            self.bodies[key] = response.body
         return response
 
     def process_exception(self, request, exception, spider):
-        # Called when a download handler or a process_request()
-        # (from other downloader middleware) raises an exception.
-
-        # Must either:
-        # - return None: continue processing this exception
-        # - return a Response object: stops process_exception() chain
-        # - return a Request object: stops process_exception() chain
-        pass
+        if self.mode == "record":
+            key = self._key(request)
+            self.entries[key] = {"url": request.url, "error": repr(exception)}
+            self.bodies.pop(key, None)
+        return None
 
     def spider_opened(self, spider):
-        spider.logger.info("Spider opened: %s" % spider.name)
+        archive_dir = data_path(
+            self.crawler.settings["RESPONSE_ARCHIVE_DIR"],
+            createdir=True,
+        )
+        self.path = pathlib.Path(archive_dir, f"{spider.name}.zip")
+        if self.mode == "replay":
+            self.archive = zipfile.ZipFile(self.path, "r")
+            self.entries = json.loads(self.archive.read("index.json"))
+
+    def spider_closed(self, spider):
+        if self.mode == "replay":
+            self.archive.close()
+            return
+        # Written at the end, so that retried requests are only stored
+        # once:
+        with zipfile.ZipFile(
+                self.path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("index.json", json.dumps(self.entries))
+            for key, body in self.bodies.items():
+                archive.writestr(self.entries[key]["body"], body)
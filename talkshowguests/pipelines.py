@@ -4,9 +4,15 @@
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
 
+import pathlib
+import time
+
 # useful for handling different item types with a single interface
-# from itemadapter import ItemAdapter
-from scrapy.exceptions import DropItem
+from itemadapter import ItemAdapter
+from scrapy.exceptions import DropItem, NotConfigured
+
+from talkshowguests.history import HistoryStore, get_episode_to_report
+from talkshowguests.items import TalkshowItem
 
 
 class TalkshowguestsPipeline:
@@ -27,3 +33,55 @@ class TalkshowguestsPipeline:
             item["name"], item["isodate"]
         ))
         return item
+
+
+class HistoryDiffPipeline:
+    """
+    Compares items with the history of reported episodes while
+    crawling and collects those that we need to report on.
+    Requires the HISTORY_FILE setting.
+    """
+
+    def __init__(self, history_file: pathlib.Path, stats):
+        self.history_file = history_file
+        self.stats = stats
+        self.history: HistoryStore | None = None
+        self.episodes_to_report: list[TalkshowItem] = []
+        self.episodes_seen: set[tuple[str, str]] = set()
+        """(name, isodate) of all scraped episodes"""
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.get("HISTORY_FILE"):
+            raise NotConfigured
+        return cls(
+            pathlib.Path(crawler.settings["HISTORY_FILE"]),
+            crawler.stats,
+        )
+
+    @classmethod
+    def get_episodes_to_report(cls, crawlers) -> list[TalkshowItem]:
+        """Collect the episodes to report from finished crawlers."""
+        return [
+            episode
+            for crawler in crawlers
+            if (pipeline := crawler.get_item_pipeline(cls))
+            for episode in pipeline.episodes_to_report
+        ]
+
+    def open_spider(self, spider):
+        self.history = HistoryStore(self.history_file)
+
+    def close_spider(self, spider):
+        self.history.close()
+
+    def process_item(self, item, spider):
+        start = time.perf_counter()
+        self.episodes_seen.add((item["name"], item["isodate"]))
+        # Work on a copy with plain dicts for nested items, the same
+        # as in the history:
+        episode = TalkshowItem(**ItemAdapter(item).asdict())
+        if episode := get_episode_to_report(episode, self.history):
+            self.episodes_to_report.append(episode)
+        self.stats.inc_value("history_diff/time", time.perf_counter() - start)
+        return item
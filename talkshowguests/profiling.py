@@ -0,0 +1,165 @@
+"""
+Sampling profiler for `talkshowguests --profile`.
+
+A background thread samples the stack of the main thread at a fixed
+interval, from before the imports until the end of the run. Each
+sample is attributed to the stage of the run (see
+`metrics.StageTimer`) and, while crawling, to the spider and callback
+(or pipeline / middleware method) that was running.
+
+Writes the samples as folded stacks (profile.folded), which
+flamegraph.pl, speedscope or inferno can turn into a flame graph, and
+a summary of the top functions (profile.txt).
+
+Only uses the standard library, so that it can be started before
+anything else is imported.
+"""
+
+import collections
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+
+current_stage = "imports"
+"""Stage of the run that new samples are attributed to"""
+
+_PACKAGE_DIR = os.path.dirname(__file__)
+
+
+def _frame_name(frame) -> str:
+    code = frame.f_code
+    return (
+        f"{code.co_qualname} "
+        f"({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+def _spider_label(frames) -> str | None:
+    """
+    Return "<spider>:<callback>" for the innermost spider method in
+    `frames`, or "<spider>:<function>" for the innermost function of
+    this package that works on behalf of a spider (pipelines,
+    middlewares).
+    """
+    # (scrapy may not be imported yet, or only partially)
+    spider_cls = getattr(sys.modules.get("scrapy"), "Spider", None)
+    if spider_cls is None:
+        return None
+    label = None
+    for frame in frames:
+        f_locals = frame.f_locals
+        obj = f_locals.get("self")
+        if isinstance(obj, spider_cls):
+            return f"{obj.name}:{frame.f_code.co_name}"
+        spider = f_locals.get("spider")
+        if (
+                label is None
+                and isinstance(spider, spider_cls)
+                and frame.f_code.co_filename.startswith(_PACKAGE_DIR)
+        ):
+            label = f"{spider.name}:{frame.f_code.co_qualname}"
+    return label
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples: collections.Counter[tuple[str, ...]] = (
+            collections.Counter())
+        self._thread_id = threading.main_thread().ident
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="profiler", daemon=True)
+        self._seconds = 0.0
+
+    def start(self):
+        self._seconds = -time.perf_counter()
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self._seconds += time.perf_counter()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._thread_id)
+            frames = []
+            while frame is not None:
+                frames.append(frame)
+                frame = frame.f_back
+            frames.reverse()  # outermost first
+            label = _spider_label(reversed(frames)) or "-"
+            self.samples[(
+                current_stage,
+                label,
+                *(_frame_name(f) for f in frames),
+            )] += 1
+            del frames, frame
+
+    def write(self, output_dir: str, top: int = 30) -> str:
+        """
+        Write profile.folded and profile.txt to `output_dir`
+        and return the summary.
+        """
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, "profile.folded"), "w") as f:
+            for stack, count in self.samples.items():
+                f.write(";".join(stack) + f" {count}\n")
+
+        total = sum(self.samples.values()) or 1
+        # Sampling takes time as well, so samples are a bit further
+        # apart than `interval`:
+        seconds_per_sample = self._seconds / total
+        by_stage = collections.Counter()
+        by_label = collections.Counter()
+        self_samples = collections.Counter()
+        inclusive_samples = collections.Counter()
+        for (stage, label, *frames), count in self.samples.items():
+            by_stage[stage] += count
+            if label != "-":
+                by_label[label] += count
+            if frames:
+                self_samples[frames[-1]] += count
+            for frame in set(frames):
+                inclusive_samples[frame] += count
+
+        def table(title: str, counter: collections.Counter) -> list[str]:
+            return [f"{title}:"] + [
+                f"  {count / total * 100:5.1f}% "
+                f"{count * seconds_per_sample:8.2f} s  {name}"
+                for name, count in counter.most_common(top)
+            ] + [""]
+
+        summary = "\n".join([
+            f"{total} samples in {self._seconds:.2f} s",
+            "",
+            *table("Stages", by_stage),
+            *table("Spiders and callbacks", by_label),
+            *table(f"Top {top} functions (self)", self_samples),
+            *table(f"Top {top} functions (inclusive)", inclusive_samples),
+        ])
+        with open(os.path.join(output_dir, "profile.txt"), "w") as f:
+            f.write(summary)
+        return summary
+
+
+profiler: SamplingProfiler | None = None
+
+
+def start_if_requested(argv: list[str]):
+    """
+    Start profiling if `--profile` is in `argv`. Has to be called
+    before the arguments are parsed, so that imports are profiled too.
+    """
+    global profiler
+    if multiprocessing.parent_process() is not None:
+        # Worker processes (see `workers.ParsePool`) import the main
+        # module with the same arguments
+        return
+    if any(a == "--profile" or a.startswith("--profile=") for a in argv):
+        profiler = SamplingProfiler()
+        profiler.start()
@@ -0,0 +1,23 @@
+import os
+
+from talkshowguests.items import TalkshowItem
+from .telegram import report_episodes_telegram
+
+
+def report_episodes(
+    episodes_to_report: list[TalkshowItem],
+    report_telegram: bool,
+):
+    if report_telegram:
+        api_token = os.getenv("TELEGRAM_API_TOKEN")
+        chat_id = os.getenv("TELEGRAM_CHAT_ID")
+        if api_token and chat_id:
+            report_episodes_telegram(
+                episodes=episodes_to_report,
+                api_token=api_token,
+                chat_id=chat_id,
+            )
+        else:
+            raise ValueError(
+                "Missing TELEGRAM_API_TOKEN or TELEGRAM_CHAT_ID"
+            )
@@ -34,6 +34,7 @@ def report_episodes_telegram(
 
     msg = _escape("*Neue Talkshow-Folgen:*\n\n")
     for episode in episodes:
+        new_guests = episode.get("guest_diff", {}).get("added", [])
         msg += "["  # start link
         msg += _escape(
             datetime.datetime.fromisoformat(episode["isodate"]).strftime(
@@ -68,6 +69,7 @@ def report_episodes_telegram(
                 "\n".join([
                     f"- {g["name"]}"
                     + (f" ({g["affiliation"]})" if g["affiliation"] else "")
+                    + (" (neu)" if g in new_guests else "")
                     for g in episode['guests']
                 ])
                 if episode["guests"]
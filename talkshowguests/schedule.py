@@ -0,0 +1,162 @@
+"""
+Minimal cron expression support for `talkshowguests serve`,
+so that the same CRAWL_SCHEDULE as for the cron job can be used.
+"""
+
+import datetime
+
+
+_FIELD_RANGES = [
+    (0, 59),  # minute
+    (0, 23),  # hour
+    (1, 31),  # day of month
+    (1, 12),  # month
+    (0, 7),  # day of week (0 and 7 = Sunday)
+]
+
+
+def _parse_field(field: str, lo: int, hi: int) -> set[int]:
+    values = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step_str = part.split("/")
+            step = int(step_str)
+        if part == "*":
+            start, end = lo, hi
+        elif "-" in part:
+            start_str, end_str = part.split("-")
+            start, end = int(start_str), int(end_str)
+        else:
+            start = int(part)
+            # "5/10" means "every 10, starting at 5":
+            end = hi if step > 1 else start
+        if start < lo or end > hi or step < 1:
+            raise ValueError(f"Invalid cron field: {field}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """
+    A five-field cron expression, e.g. "*/10 * * * *".
+
+    Like cron, if both day of month and day of week are restricted,
+    a day matches if either of them matches.
+    """
+
+    def __init__(self, expression: str):
+        fields = expression.split()
+        if len(fields) != 5:
+            raise ValueError(
+                f"Expected five fields in cron expression: {expression}"
+            )
+        (
+            self.minutes,
+            self.hours,
+            self.days,
+            self.months,
+            weekdays,
+        ) = [
+            _parse_field(field, lo, hi)
+            for field, (lo, hi) in zip(fields, _FIELD_RANGES)
+        ]
+        self.weekdays = {d % 7 for d in weekdays}
+        self._days_restricted = fields[2] != "*"
+        self._weekdays_restricted = fields[4] != "*"
+
+    def _day_matches(self, date: datetime.datetime) -> bool:
+        if date.month not in self.months:
+            return False
+        day_ok = date.day in self.days
+        # Python: Monday == 0, cron: Sunday == 0
+        weekday_ok = (date.weekday() + 1) % 7 in self.weekdays
+        if self._days_restricted and self._weekdays_restricted:
+            return day_ok or weekday_ok
+        return day_ok and weekday_ok
+
+    def next_run(self, after: datetime.datetime) -> datetime.datetime:
+        """Return the first matching minute strictly after `after`."""
+        t = after.replace(second=0, microsecond=0) + datetime.timedelta(
+            minutes=1)
+        # Cron expressions repeat at least every few years (Feb 29):
+        limit = t + datetime.timedelta(days=5 * 366)
+        while t < limit:
+            if not self._day_matches(t):
+                t = (t + datetime.timedelta(days=1)).replace(
+                    hour=0, minute=0)
+                continue
+            if t.hour not in self.hours:
+                t = (t + datetime.timedelta(hours=1)).replace(minute=0)
+                continue
+            if t.minute not in self.minutes:
+                t += datetime.timedelta(minutes=1)
+                continue
+            return t
+        raise ValueError("Cron expression never matches")
+
+
+class ShowSchedule:
+    """
+    Adaptive schedule for a single show: Crawl often in the window
+    before an episode airs (when guests are announced) and rarely
+    otherwise.
+
+    The next episode is either a known upcoming one or, if the show
+    aired recently, the next day on which it usually airs. Shows that
+    haven't aired for a while (e.g. during a summer break) are only
+    crawled every `far_interval` until they announce a new episode.
+    """
+
+    def __init__(
+        self,
+        near_interval=datetime.timedelta(minutes=10),
+        far_interval=datetime.timedelta(hours=6),
+        window=datetime.timedelta(days=1),
+        break_after=datetime.timedelta(days=14),
+    ):
+        self.near_interval = near_interval
+        self.far_interval = far_interval
+        self.window = window
+        """How long before the day an episode airs to crawl often
+        (guests are announced at most about a day before)"""
+        self.break_after = break_after
+        """How long after the last episode a show is considered
+        to be on a break"""
+
+    def next_air_date(
+        self,
+        air_dates: set[datetime.date],
+        today: datetime.date,
+    ) -> datetime.date | None:
+        upcoming = [d for d in air_dates if d >= today]
+        if upcoming:
+            return min(upcoming)
+        recent = [d for d in air_dates if today - d <= self.break_after]
+        if not recent:
+            return None
+        # Weekdays on which the show aired in the last four weeks:
+        weekdays = {
+            d.weekday() for d in air_dates
+            if today - d <= datetime.timedelta(weeks=4)
+        }
+        return next(
+            today + datetime.timedelta(days=i)
+            for i in range(7)
+            if (today + datetime.timedelta(days=i)).weekday() in weekdays
+        )
+
+    def next_run(
+        self,
+        after: datetime.datetime,
+        air_dates: set[datetime.date],
+    ) -> datetime.datetime:
+        """Return when to crawl the show next after crawling at `after`."""
+        next_air_date = self.next_air_date(air_dates, after.date())
+        if next_air_date is None:
+            return after + self.far_interval
+        window_start = datetime.datetime.combine(
+            next_air_date, datetime.time.min) - self.window
+        if after >= window_start:
+            return after + self.near_interval
+        return min(after + self.far_interval, window_start)
@@ -0,0 +1,163 @@
+"""
+Long-running mode: Keep one process (and one Twisted reactor) alive
+and crawl according to a cron expression instead of starting a new
+process from cron for every crawl.
+
+With the schedule "adaptive", each show is crawled according to when
+its episodes air instead (see `ShowSchedule`).
+
+This saves the interpreter startup, imports and spider loading on
+every crawl, keeps the history database open between crawls, and keeps
+Scrapy's DNS cache warm.
+"""
+
+import argparse
+import datetime
+import logging
+
+from scrapy.crawler import CrawlerProcess
+from scrapy.settings import Settings
+from scrapy.utils.reactor import install_reactor
+
+from .history import load_history, update_history
+from .items import GuestItem
+from .metrics import (
+    StageTimer,
+    get_run_metrics,
+    get_spider_stats,
+    write_metrics,
+)
+from .pipelines import HistoryDiffPipeline
+from .reports import report_episodes
+from .schedule import CronSchedule, ShowSchedule
+
+
+logger = logging.getLogger(__name__)
+
+
+def serve(settings: Settings, args: argparse.Namespace, schedule: str):
+    if schedule == "adaptive":
+        cron_schedule = None
+        show_schedule = ShowSchedule()
+    else:
+        cron_schedule = CronSchedule(schedule)
+
+    # The reactor has to be installed before anything imports
+    # twisted.internet.reactor, which we need for scheduling:
+    install_reactor(
+        settings["TWISTED_REACTOR"],
+        settings["ASYNCIO_EVENT_LOOP"],
+    )
+    from twisted.internet import defer, reactor, threads
+
+    process = CrawlerProcess(settings)
+    spider_names = process.spider_loader.list()
+    history = load_history(args.history_file, args.import_history)
+
+    now = datetime.datetime.now()
+    next_runs: dict[str, datetime.datetime] = dict.fromkeys(
+        spider_names,
+        # Without knowing the shows' episodes yet, crawl all of them
+        # first in adaptive mode:
+        cron_schedule.next_run(now) if cron_schedule else now,
+    )
+    """When to crawl each spider next"""
+    show_names: dict[str, set[str]] = {
+        spider: set() for spider in spider_names}
+    """Names of the shows that each spider scraped so far"""
+
+    def get_air_dates(crawler) -> set[datetime.date]:
+        names = show_names[crawler.spidercls.name]
+        isodates = set()
+        if pipeline := crawler.get_item_pipeline(HistoryDiffPipeline):
+            for name, isodate in pipeline.episodes_seen:
+                names.add(name)
+                isodates.add(isodate)
+        for name in names:
+            isodates.update(history.get_isodates(name))
+        return {
+            datetime.date.fromisoformat(isodate[:10])
+            for isodate in isodates
+        }
+
+    def update_next_runs(crawlers):
+        now = datetime.datetime.now()
+        if cron_schedule:
+            next_runs.update(
+                dict.fromkeys(spider_names, cron_schedule.next_run(now)))
+            return
+        for crawler in crawlers:
+            spider = crawler.spidercls.name
+            next_runs[spider] = show_schedule.next_run(
+                now, get_air_dates(crawler))
+            logger.info(
+                f"Next crawl of {spider} at {next_runs[spider].isoformat()}")
+
+    @defer.inlineCallbacks
+    def crawl_and_report(spiders_to_crawl: list[str]):
+        if args.crawler_results:
+            # Clear previous results because 'jsonlines' seems to append:
+            args.crawler_results.unlink(missing_ok=True)
+        crawlers = [
+            process.create_crawler(spider) for spider in spiders_to_crawl
+        ]
+        for crawler in crawlers:
+            process.crawl(crawler)
+        timer = StageTimer()
+        with timer.stage("crawl"):
+            yield process.join()
+
+        episodes_to_report = HistoryDiffPipeline.get_episodes_to_report(
+            crawlers)
+        with timer.stage("report"):
+            # Reporting uses asyncio.run(), which cannot be called from
+            # within the reactor's (asyncio) event loop:
+            yield threads.deferToThread(
+                report_episodes,
+                episodes_to_report,
+                args.report_telegram,
+            )
+        with timer.stage("update_history"):
+            update_history(history, episodes_to_report)
+        logger.info(f"Guest parser cache: {GuestItem.cache_info()}")
+
+        update_next_runs(crawlers)
+        if args.metrics_dir:
+            write_metrics(
+                get_run_metrics(
+                    get_spider_stats(crawlers), timer.seconds, next_runs),
+                args.metrics_dir,
+            )
+
+    def schedule_next_crawl(_=None):
+        now = datetime.datetime.now()
+        next_run = min(next_runs.values())
+        logger.info(f"Next crawl at {next_run.isoformat()}")
+        reactor.callLater(
+            max(0.0, (next_run - now).total_seconds()),
+            run_scheduled_crawl,
+        )
+
+    def run_scheduled_crawl():
+        now = datetime.datetime.now()
+        due_spiders = [
+            spider for spider, next_run in next_runs.items()
+            if next_run <= now
+        ]
+        # In case the crawl fails before updating the next runs:
+        for spider in due_spiders:
+            next_runs[spider] = (
+                cron_schedule.next_run(now) if cron_schedule
+                else now + show_schedule.near_interval
+            )
+        d = crawl_and_report(due_spiders)
+        d.addErrback(
+            lambda failure: logger.error(
+                f"Crawl failed: {failure.getTraceback()}"
+            )
+        )
+        d.addBoth(schedule_next_crawl)
+
+    logger.info(f"Serving with crawl schedule: {schedule}")
+    schedule_next_crawl()
+    process.start(stop_after_crawl=False)
@@ -24,6 +24,18 @@ ROBOTSTXT_OBEY = True
 # Configure maximum concurrent requests performed by Scrapy (default: 16)
 #CONCURRENT_REQUESTS = 32
 
+# Concurrency per host. Every spider has its own downloader, so these
+# limits apply per spider: Caren Miosga and Maischberger both crawl
+# www.daserste.de and tvtickets.de, Markus Lanz and Maybrit Illner
+# both request a single page from www.zdf.de.
+# (Without a "delay", AutoThrottle sets the delay of each host.)
+DOWNLOAD_SLOTS = {
+    "www.daserste.de": {"concurrency": 2},
+    "tvtickets.de": {"concurrency": 1},
+    "www.zdf.de": {"concurrency": 1},
+    "www1.wdr.de": {"concurrency": 1},
+}
+
 # Configure a delay for requests for the same website (default: 0)
 # See https://docs.scrapy.org/en/latest/topics/settings.html#download-delay
 # See also autothrottle settings and docs
@@ -46,48 +58,106 @@ ROBOTSTXT_OBEY = True
 
 # Enable or disable spider middlewares
 # See https://docs.scrapy.org/en/latest/topics/spider-middleware.html
-#SPIDER_MIDDLEWARES = {
-#    "talkshowguests.middlewares.TalkshowguestsSpiderMiddleware": 543,
-#}
+SPIDER_MIDDLEWARES = {
+    # Closest to the engine, so that replayed requests are filtered too:
+    "talkshowguests.middlewares.IncrementalCrawlSpiderMiddleware": 100,
+    "talkshowguests.middlewares.TalkshowguestsSpiderMiddleware": 543,
+    # Closest to the spider, so that only the callbacks are timed:
+    "talkshowguests.metrics.CallbackMetricsMiddleware": 1000,
+}
 
 # Enable or disable downloader middlewares
 # See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html
-#DOWNLOADER_MIDDLEWARES = {
-#    "talkshowguests.middlewares.TalkshowguestsDownloaderMiddleware": 543,
-#}
+DOWNLOADER_MIDDLEWARES = {
+    "talkshowguests.middlewares.TalkshowguestsDownloaderMiddleware": 543,
+    "talkshowguests.middlewares.ResponseArchiveDownloaderMiddleware": 950,
+}
+
+# Skipping callbacks of pages that are the same as in the previous crawl
+# (see middlewares.py). Relative paths are placed in the .scrapy directory.
+CONDITIONAL_CACHE_ENABLED = True
+CONDITIONAL_CACHE_DIR = "conditionalcache"
+
+# Don't request pages of episodes that have already aired, except for
+# a full crawl every INCREMENTAL_FULL_CRAWL_HOURS, which requests them
+# last (see middlewares.py)
+INCREMENTAL_CRAWL_ENABLED = True
+INCREMENTAL_FULL_CRAWL_HOURS = 24
+
+# Record all responses to, or replay them from, an archive per spider
+# ("record", "replay" or None; see middlewares.py)
+RESPONSE_ARCHIVE_MODE = None
+RESPONSE_ARCHIVE_DIR = "responsearchive"
+
+# Episodes extracted from the scripts of ZDF pages (see spiders/utils_zdf.py)
+ZDF_SCRIPT_CACHE_DIR = "zdfscriptcache"
+
+# Parse ZDF pages in a pool of this many worker processes (or threads,
+# with PARSE_WORKERS_KIND = "thread") instead of blocking the reactor,
+# 0 to parse them in the callbacks (see workers.py)
+PARSE_WORKERS = 0
+PARSE_WORKERS_KIND = "process"
 
 # Enable or disable extensions
 # See https://docs.scrapy.org/en/latest/topics/extensions.html
-#EXTENSIONS = {
-#    "scrapy.extensions.telnet.TelnetConsole": None,
-#}
+EXTENSIONS = {
+    # For metrics.py:
+    "talkshowguests.metrics.DownloadLatencyStats": 500,
+}
 
 # Configure item pipelines
 # See https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 ITEM_PIPELINES = {
     "talkshowguests.pipelines.TalkshowguestsPipeline": 300,
+    "talkshowguests.pipelines.HistoryDiffPipeline": 400,
 }
 
 # Enable and configure the AutoThrottle extension (disabled by default)
 # See https://docs.scrapy.org/en/latest/topics/autothrottle.html
-#AUTOTHROTTLE_ENABLED = True
-# The initial download delay
-#AUTOTHROTTLE_START_DELAY = 5
+AUTOTHROTTLE_ENABLED = True
+# The initial download delay. Only the few requests after the start pages
+# are sent before the first latencies are known, so don't wait long:
+AUTOTHROTTLE_START_DELAY = 0.5
 # The maximum download delay to be set in case of high latencies
-#AUTOTHROTTLE_MAX_DELAY = 60
+AUTOTHROTTLE_MAX_DELAY = 10
 # The average number of requests Scrapy should be sending in parallel to
-# each remote server
-#AUTOTHROTTLE_TARGET_CONCURRENCY = 1.0
+# each remote server (per spider, see DOWNLOAD_SLOTS)
+AUTOTHROTTLE_TARGET_CONCURRENCY = 1.0
 # Enable showing throttling stats for every response received:
 #AUTOTHROTTLE_DEBUG = False
 
-# Enable and configure HTTP caching (disabled by default)
-# See https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
-#HTTPCACHE_ENABLED = True
-#HTTPCACHE_EXPIRATION_SECS = 0
-#HTTPCACHE_DIR = "httpcache"
-#HTTPCACHE_IGNORE_HTTP_CODES = []
-#HTTPCACHE_STORAGE = "scrapy.extensions.httpcache.FilesystemCacheStorage"
+# Cache pages across crawls, with a TTL per kind of page (see
+# httpcache.py). Relative paths are placed in the .scrapy directory.
+HTTPCACHE_ENABLED = True
+HTTPCACHE_POLICY = "talkshowguests.httpcache.PageKindCachePolicy"
+HTTPCACHE_STORAGE = "talkshowguests.httpcache.SqliteCacheStorage"
+HTTPCACHE_DIR = "httpcache"
+HTTPCACHE_MAX_SIZE_MB = 200
+# (URL pattern, kind of page), the first matching pattern wins:
+HTTPCACHE_PAGE_KINDS = [
+    (r"/robots\.txt$", "robots"),
+    # Tickets pages of Caren Miosga and Maischberger
+    (r"^https://tvtickets\.de/", "tickets"),
+    # Markus Lanz and Maybrit Illner (all episodes on one page)
+    (r"^https://www\.zdf\.de/talk/", "zdf_show"),
+    # Caren Miosga and Maischberger
+    (r"^https://www\.daserste\.de/.*/sendung/index\.html$", "overview"),
+    (r"^https://www\.daserste\.de/", "episode"),
+    # Hart aber fair (all episodes on one page)
+    (r"^https://www1\.wdr\.de/", "overview"),
+]
+# Seconds until cached pages of each kind are revalidated, None for pages
+# that never change ("past_episode" is an episode page of an episode that
+# has already aired). Guests, tickets and dates change any time, so all
+# other pages are revalidated on every request.
+HTTPCACHE_PAGE_KIND_TTLS = {
+    "robots": 24 * 60 * 60,
+    "past_episode": None,
+    "episode": 0,
+    "overview": 0,
+    "tickets": 0,
+    "zdf_show": 0,
+}
 
 # Set settings whose default value is deprecated to a future-proof value
 FEED_EXPORT_ENCODING = "utf-8"
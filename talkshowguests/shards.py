@@ -0,0 +1,142 @@
+"""
+Crawling in several processes (`talkshowguests --workers N`): The
+spiders are split into N shards, each crawled by a process with its
+own reactor, so that the crawl can use N cores.
+
+The workers stream their items back to the parent process, which
+deduplicates them across shards with `TalkshowguestsPipeline`, writes
+the crawler results and diffs them against the history, all while the
+workers are still crawling.
+"""
+
+import logging
+import multiprocessing
+import pathlib
+import queue
+
+from itemadapter import ItemAdapter
+from scrapy import signals
+from scrapy.crawler import CrawlerProcess
+from scrapy.exceptions import DropItem
+from scrapy.exporters import JsonLinesItemExporter
+from scrapy.settings import Settings
+from scrapy.utils.misc import load_object
+
+from .history import HistoryStore, get_episode_to_report
+from .items import TalkshowItem
+from .pipelines import TalkshowguestsPipeline
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_shards(spider_names: list[str], workers: int) -> list[list[str]]:
+    return [
+        spider_names[i::workers]
+        for i in range(min(workers, len(spider_names)))
+    ]
+
+
+def _crawl_shard(settings: dict, spider_names: list[str], results):
+    """Crawl `spider_names` and put items and stats into `results`."""
+    try:
+        settings = Settings(settings)
+        # Items are diffed and exported by the parent process:
+        settings.set("ITEM_PIPELINES", {
+            **settings.getdict("ITEM_PIPELINES"),
+            "talkshowguests.pipelines.HistoryDiffPipeline": None,
+        })
+        settings.set("FEED_URI", None)
+        settings.set("FEEDS", {})
+        # Each worker would need a port of its own:
+        settings.set("TELNETCONSOLE_ENABLED", False)
+
+        def item_scraped(item, spider):
+            results.put(("item", item))
+
+        process = CrawlerProcess(settings)
+        crawlers = []
+        for spider_name in spider_names:
+            crawler = process.create_crawler(spider_name)
+            crawler.signals.connect(item_scraped, signal=signals.item_scraped)
+            process.crawl(crawler)
+            crawlers.append(crawler)
+        process.start()
+        for crawler in crawlers:
+            results.put(
+                ("stats", crawler.spider.name, crawler.stats.get_stats()))
+    finally:
+        results.put(("done",))
+
+
+def crawl_in_workers(
+    settings: Settings,
+    workers: int,
+    history: HistoryStore,
+    crawler_results: pathlib.Path | None = None,
+) -> tuple[list[TalkshowItem], dict[str, dict]]:
+    """
+    Crawl all spiders in `workers` processes and return the episodes to
+    report and the stats of each spider.
+    """
+    spider_loader = load_object(settings["SPIDER_LOADER_CLASS"]).from_settings(
+        settings.frozencopy())
+    shards = get_shards(spider_loader.list(), workers)
+    # Don't fork the parent, which may be running the profiler's thread:
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    processes = [
+        context.Process(
+            target=_crawl_shard,
+            args=(settings.copy_to_dict(), shard, results),
+            name=f"crawl-{i}",
+        )
+        for i, shard in enumerate(shards)
+    ]
+    for process in processes:
+        process.start()
+
+    dedup = TalkshowguestsPipeline()
+    episodes_to_report = []
+    spider_stats = {}
+    results_file = crawler_results.open("wb") if crawler_results else None
+    exporter = None
+    if results_file:
+        exporter = JsonLinesItemExporter(
+            results_file, encoding=settings["FEED_EXPORT_ENCODING"])
+        exporter.start_exporting()
+    try:
+        num_done = 0
+        while num_done < len(processes):
+            try:
+                kind, *payload = results.get(timeout=1)
+            except queue.Empty:
+                if not any(process.is_alive() for process in processes):
+                    logger.error("Crawl workers exited unexpectedly")
+                    break
+                continue
+            if kind == "done":
+                num_done += 1
+            elif kind == "stats":
+                spider_name, stats = payload
+                spider_stats[spider_name] = stats
+            else:
+                item, = payload
+                try:
+                    dedup.process_item(item, None)
+                except DropItem:
+                    continue
+                if exporter:
+                    exporter.export_item(item)
+                # Work on a copy with plain dicts for nested items, the
+                # same as in the history (see HistoryDiffPipeline):
+                episode = TalkshowItem(**ItemAdapter(item).asdict())
+                if episode := get_episode_to_report(episode, history):
+                    episodes_to_report.append(episode)
+    finally:
+        if exporter:
+            exporter.finish_exporting()
+            results_file.close()
+    for process in processes:
+        process.join()
+    return episodes_to_report, spider_stats
@@ -4,9 +4,7 @@ import re
 import scrapy
 
 from talkshowguests.items import GuestItem, TalkshowItem
-from talkshowguests.spiders.utils_tvtickets import (
-    find_show_in_tickets_page,
-)
+from talkshowguests.spiders.utils_tvtickets import TicketsPageCache
 
 
 class CarenMiosgaSpider(scrapy.Spider):
@@ -16,7 +14,15 @@ class CarenMiosgaSpider(scrapy.Spider):
         "https://www.daserste.de/information/talk/caren-miosga/sendung/index.html",  # noqa: E501
     ]
 
-    def parse(self, response):
+    tickets_pages_and_locations = [
+        ("https://tvtickets.de/carenmiosga", "Berlin Adlershof"),
+    ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tickets_pages = TicketsPageCache(self)
+
+    async def parse(self, response):
         if (
                 not response.css("head > title::text").get().startswith(
                     "Alle Sendungen")
@@ -41,54 +47,35 @@ class CarenMiosgaSpider(scrapy.Spider):
             else:
                 date = datetime.datetime.fromisoformat("1970-01-01")
 
+            talkshow_data = {
+                "name": "Caren Miosga",
+                "isodate": date.isoformat(),
+                "topic": response.css("h1::text").get(),
+                "topic_details": "",
+                "url": response.url,
+                "guests": [GuestItem.from_text(g) for g in guests],
+            }
+
             # Next check the tickets page to see where and when exactly
             # this episode will be recorded:
-            yield scrapy.Request(
-                "https://tvtickets.de/carenmiosga",
-                meta={"talkshow_data": {
-                    "name": "Caren Miosga",
-                    "isodate": date.isoformat(),
-                    "topic": response.css("h1::text").get(),
-                    "topic_details": "",
-                    "url": response.url,
-                    "guests": [GuestItem.from_text(g) for g in guests],
-                }},
-                callback=self.parse_tickets_page,
-                errback=self.on_request_error,
-                # Duplicate requests to this page are ok,
-                # because we'll request it coming from different episodes:
-                dont_filter=True,
-            )
+            # If the request failed or the episode is not listed,
+            # we'll just yield as much of the item as we already have.
+            if recording_info := await self.tickets_pages.find_show(
+                    self.tickets_pages_and_locations,
+                    isodate=talkshow_data["isodate"],
+            ):
+                talkshow_data["recording_info"] = recording_info
+            yield TalkshowItem(**talkshow_data)
 
         # Follow links to the respective page of each show:
         hrefs = response.css(
             "h3.ressort + .teaser > .headline > a::attr(href)"
         ).getall()
         for href in hrefs:
-            yield scrapy.Request(response.urljoin(href), self.parse)
-
-    def parse_tickets_page(self, response):
-        if item := find_show_in_tickets_page(
-                response,
-                recording_location="Berlin Adlershof",
-        ):
-            yield item
-            return
-
-        # Episode not found on the tickets page
-        yield TalkshowItem(
-            **response.meta["talkshow_data"],
-        )
-
-    def on_request_error(self, failure):
-        """
-        When a request to the tickets page failed,
-        we'll just yield as much of the item as we already have.
-        """
-        self.log(
-            f"Request failed, yielding intermediate result; "
-            f"url: {failure.request.url}"
-        )
-        yield TalkshowItem(
-            **failure.request.meta["talkshow_data"],
-        )
+            yield scrapy.Request(
+                response.urljoin(href),
+                self.parse,
+                # Our output also depends on the tickets page, so don't
+                # replay it only because this page is unchanged:
+                meta={"dont_replay": True},
+            )
@@ -3,10 +3,9 @@ import re
 
 import scrapy
 
+from talkshowguests.history import is_past
 from talkshowguests.items import TalkshowItem
-from talkshowguests.spiders.utils_tvtickets import (
-    find_show_in_tickets_page,
-)
+from talkshowguests.spiders.utils_tvtickets import TicketsPageCache
 
 
 class MaischbergerSpider(scrapy.Spider):
@@ -16,6 +15,17 @@ class MaischbergerSpider(scrapy.Spider):
         "https://www.daserste.de/information/talk/maischberger/sendung/index.html",  # noqa: E501
     ]
 
+    # Maischberger is recorded either in Berlin or in Cologne.
+    # If an episode is listed on several pages, the first one wins.
+    tickets_pages_and_locations = [
+        ("https://tvtickets.de/maischberger-ber.php", "Berlin Adlershof"),
+        ("https://tvtickets.de/maischberger-koe.php", "Köln WDR Studio"),
+    ]
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.tickets_pages = TicketsPageCache(self)
+
     def parse(self, response):
         teasers = response.css(".teaser")
         for teaser in teasers:
@@ -32,6 +42,13 @@ class MaischbergerSpider(scrapy.Spider):
                 "%d.%m.%Y"
             )
 
+            if not is_past(date_of_show.isoformat()):
+                # Download the tickets pages while we're requesting the
+                # episode pages (only if there are upcoming episodes,
+                # pages of past ones are usually skipped):
+                self.tickets_pages.prefetch(
+                    [url for url, _ in self.tickets_pages_and_locations])
+
             # Remove prefix and postfix:
             guest_list = teaser_txt
             match = re.search(
@@ -50,16 +67,21 @@ class MaischbergerSpider(scrapy.Spider):
             href = teaser.css(".headline>a::attr(href)").get()
             yield scrapy.Request(
                 response.urljoin(href),
-                meta={"talkshow_data": {
-                    "name": "Maischberger",
-                    "guest_list": guest_list,
-                    "isodate": date_of_show.isoformat(),
-                }},
+                meta={
+                    "talkshow_data": {
+                        "name": "Maischberger",
+                        "guest_list": guest_list,
+                        "isodate": date_of_show.isoformat(),
+                    },
+                    # Our output also depends on the tickets pages, so
+                    # don't replay it only because this page is unchanged:
+                    "dont_replay": True,
+                },
                 callback=self.parse_episode_page,
                 errback=self.on_request_error,
             )
 
-    def parse_episode_page(self, response):
+    async def parse_episode_page(self, response):
         # Maischberger does not seem to list a concise topic
         # for an entire episode. Instead there are usually three
         # paragraphs:
@@ -71,66 +93,38 @@ class MaischbergerSpider(scrapy.Spider):
         # -> Use the first two paragraphs as topic:
         topic = " ".join(response.css(".con p::text").getall()[:2])
 
-        # Next check the tickets page to see where and when exactly
-        # this episode will be recorded:
-        yield scrapy.Request(
-            "https://tvtickets.de/maischberger-ber.php",
-            meta={"talkshow_data": {
-                **response.meta["talkshow_data"],
-                "topic": topic,
-                "topic_details": "",
-                "url": response.url,
-            }},
-            callback=self.parse_tickets_page,
-            errback=self.on_request_error,
-            # Duplicate requests to this page are ok,
-            # because we'll request it coming from different episodes:
-            dont_filter=True,
-        )
+        talkshow_data = {
+            **response.meta["talkshow_data"],
+            "topic": topic,
+            "topic_details": "",
+            "url": response.url,
+        }
 
-    def parse_tickets_page(self, response, location="Berlin Adlershof"):
-        if item := find_show_in_tickets_page(
-                response,
-                recording_location=location,
+        # Next check the tickets pages to see where and when exactly
+        # this episode will be recorded:
+        if recording_info := await self.tickets_pages.find_show(
+                self.tickets_pages_and_locations,
+                isodate=talkshow_data["isodate"],
         ):
-            yield item
-            return
-
-        # Eposide not found on this ticket page
-        if location == "Berlin Adlershof":
-            # We always check the page for Berlin first (parse_episode_page).
-            # At this point we didn't find the event there, so try the page
-            # for cologne:
-            yield scrapy.Request(
-                "https://tvtickets.de/maischberger-koe.php",
-                meta={"talkshow_data": {
-                    **response.meta["talkshow_data"],
-                }},
-                callback=lambda response: self.parse_tickets_page(
-                    response=response,
-                    location="Köln WDR Studio"
-                ),
-                errback=self.on_request_error,
-                # Duplicate requests to this page are ok,
-                # because we'll request it coming from different episodes:
-                dont_filter=True,
+            yield TalkshowItem.from_guest_list(
+                **talkshow_data,
+                recording_info=recording_info,
             )
         else:
-            # Event is neither on the Berlin nor the Cologne ticket page.
+            # Event is on none of the ticket pages (or requests failed).
             # TalkshowItem without ticket info
-            yield TalkshowItem.from_guest_list(
-                **response.meta["talkshow_data"],
-            )
+            yield TalkshowItem.from_guest_list(**talkshow_data)
 
     def on_request_error(self, failure):
         """
-        When a request to a subpage or the tickets page failed,
+        When a request to a subpage failed,
         we'll just yield as much of the item as we already have.
         """
         self.log(
             f"Request failed, yielding intermediate result; "
             f"url: {failure.request.url}"
         )
+        self.crawler.stats.inc_value("errback_count")
         yield TalkshowItem.from_guest_list(
             **failure.request.meta["talkshow_data"],
         )
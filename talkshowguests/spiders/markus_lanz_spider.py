@@ -5,8 +5,10 @@ import scrapy
 
 from talkshowguests.items import GuestItem, RecordingInfoItem, TalkshowItem
 from talkshowguests.spiders.utils_zdf import (
-    get_episodes_from_zdf_page,
+    ZdfScriptCache,
+    get_episodes_from_zdf_page_async,
 )
+from talkshowguests.workers import ParsePool
 
 
 class MarkusLanzSpider(scrapy.Spider):
@@ -16,9 +18,24 @@ class MarkusLanzSpider(scrapy.Spider):
         "https://www.zdf.de/talk/markus-lanz-114",
     ]
 
-    def parse(self, response):
-        for episode_obj in get_episodes_from_zdf_page(
-                response, debug_dump_json=False):
+    # Without a crawler (e.g. in benchmarks), pages are parsed uncached
+    # and in the callback:
+    script_cache: ZdfScriptCache | None = None
+    parse_pool: ParsePool | None = None
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        spider.script_cache = ZdfScriptCache.from_crawler(crawler, spider.name)
+        spider.parse_pool = ParsePool.from_crawler(crawler)
+        return spider
+
+    async def parse(self, response):
+        for episode_obj in await get_episodes_from_zdf_page_async(
+                response,
+                script_cache=self.script_cache,
+                parse_pool=self.parse_pool,
+        ):
             guest_paragraph_objs = episode_obj.get(
                 "longInfoText", {}).get(
                 "items", [{}])[0].get(
@@ -1,38 +1,151 @@
-from talkshowguests.items import RecordingInfoItem, TalkshowItem
+import asyncio
+import datetime
+import logging
+import weakref
 
+import scrapy
+from scrapy.utils.defer import deferred_to_future
 
-def find_show_in_tickets_page(
+from talkshowguests.items import RecordingInfoItem
+
+
+logger = logging.getLogger(__name__)
+
+
+class TicketsPageCache:
+    """
+    Downloads each tickets page at most once per crawl.
+
+    Episodes are usually listed on the same tickets page, so instead of
+    requesting it once per episode, all episodes share one download,
+    even if it is still in progress when they ask for it.
+    """
+
+    def __init__(self, spider: scrapy.Spider):
+        self.spider = spider
+        self._downloads: dict[str, asyncio.Future] = {}
+        self._merged_indexes: dict[
+            tuple[tuple[str, str], ...], dict[str, RecordingInfoItem]
+        ] = {}
+
+    def prefetch(self, urls: list[str]):
+        """Start downloading the given tickets pages in the background."""
+        for url in urls:
+            if url not in self._downloads:
+                self._downloads[url] = asyncio.ensure_future(
+                    self._download(url))
+
+    async def get(self, url: str) -> scrapy.http.Response | None:
+        """Return the tickets page or None if the download failed."""
+        self.prefetch([url])
+        return await self._downloads[url]
+
+    async def find_show(
+        self,
+        tickets_pages: list[tuple[str, str]],
+        isodate: str,
+    ) -> RecordingInfoItem | None:
+        """
+        Return the recording info for the episode airing at `isodate`.
+
+        `tickets_pages` is a list of (tickets page URL, recording
+        location). All pages are downloaded concurrently. If an episode
+        is listed on several pages, earlier pages take precedence.
+        """
+        key = tuple(tickets_pages)
+        if key not in self._merged_indexes:
+            responses = await asyncio.gather(
+                *(self.get(url) for url, _ in tickets_pages))
+            merged_index = {}
+            for response, (_, location) in zip(responses, tickets_pages):
+                if response is None:
+                    # Download failed
+                    continue
+                for date, recording_info in get_tickets_index(
+                        response, location).items():
+                    merged_index.setdefault(date, recording_info)
+            self._merged_indexes[key] = merged_index
+        recording_info = self._merged_indexes[key].get(isodate[:10])
+        # Copy, so that items of different episodes don't share it:
+        return recording_info.copy() if recording_info else None
+
+    async def _download(self, url: str) -> scrapy.http.Response | None:
+        try:
+            # Only downloader middlewares are applied to this request:
+            response = await deferred_to_future(
+                self.spider.crawler.engine.download(scrapy.Request(url))
+            )
+        except Exception as e:
+            self.spider.log(f"Request failed: {url}; {e}")
+            self._count_failure()
+            return None
+        if response.status != 200:
+            self.spider.log(
+                f"Request failed: {url}; status {response.status}")
+            self._count_failure()
+            return None
+        return response
+
+    def _count_failure(self):
+        # Episodes are yielded without recording info, as errbacks of
+        # other requests do, so count it the same way:
+        self.spider.crawler.stats.inc_value("errback_count")
+
+
+_MONTHS = {
+    month: i
+    for i, month in enumerate(
+        ["JAN", "FEB", "MÄR", "APR", "MAI", "JUN", "JUL", "AUG",
+         "SEP", "OKT", "NOV", "DEZ"],
+        start=1,
+    )
+}
+
+_tickets_indexes: weakref.WeakKeyDictionary[
+    scrapy.http.Response, dict[str, dict[str, RecordingInfoItem]]
+] = weakref.WeakKeyDictionary()
+"""Indexes built by `get_tickets_index` per response and location"""
+
+
+def get_tickets_index(
     response,
-    recording_location,
-) -> TalkshowItem | None:
+    recording_location: str,
+) -> dict[str, RecordingInfoItem]:
     """
-    Return a complemented TalkshowItem based on info from a tickets page.
+    Return the recording info of all events listed on a tickets page,
+    keyed by date ("YYYY-MM-DD").
 
-    Assuming that `response.meta` already includes the basic info beyond
-    the `recording_info` field.
+    The index is built only once per response, so looking up the
+    episodes of a whole season doesn't parse the page over and over.
+    Events without a valid date are skipped, so that they don't keep
+    the other episodes from being found.
     """
-    episode_elems = response.css(".date_wrapper")
-    months = ["JAN", "FEB", "MÄR", "APR", "MAI", "JUN", "JUL", "AUG",
-              "SEP", "OKT", "NOV", "DEZ"]
-    # Search the listed events for the episode of which we already
-    # have an isodate:
-    for episode_elem in episode_elems:
-        year = episode_elem.css(".year::text").get()
-        month = months.index(episode_elem.css(".month::text").get()) + 1
-        day = int(episode_elem.css(".day::text").get())
-        isodate = f"{year}-{month:02}-{day:02}"
-        if not response.meta["talkshow_data"]["isodate"].startswith(
-                isodate):
+    indexes = _tickets_indexes.setdefault(response, {})
+    if recording_location in indexes:
+        return indexes[recording_location]
+
+    index = {}
+    for episode_elem in response.css(".date_wrapper"):
+        try:
+            date = datetime.date(
+                int(episode_elem.css(".year::text").get()),
+                _MONTHS[episode_elem.css(".month::text").get()],
+                int(episode_elem.css(".day::text").get()),
+            )
+        except (TypeError, ValueError, KeyError):
+            logger.warning(
+                f"Skipping event without a valid date on {response.url}: "
+                f"{episode_elem.get()}"
+            )
             continue
-        return TalkshowItem.from_guest_list(
-            recording_info=RecordingInfoItem(
-                location=recording_location,
-                tickets_available=episode_elem.css(
-                    ".btn_tickets_buchen_info::text").get() == "BUCHEN",
-                doors=episode_elem.css(
-                    ".termin_abholen::text").get().strip(),
-                tickets_url=response.url,
-            ),
-            **response.meta["talkshow_data"],
-        )
-    return None
+        index.setdefault(date.isoformat(), RecordingInfoItem(
+            location=recording_location,
+            tickets_available=episode_elem.css(
+                ".btn_tickets_buchen_info::text").get() == "BUCHEN",
+            doors=episode_elem.css(
+                ".termin_abholen::text").get(default="").strip(),
+            tickets_url=response.url,
+        ))
+    indexes[recording_location] = index
+    return index
+
@@ -3,80 +3,316 @@ Utilities for talkshows on ZDF,
 which have similar websites.
 """
 
+import hashlib
 import json
+import pathlib
 import re
+import shelve
+
+from scrapy import Selector, signals
+from scrapy.utils.project import data_path
+
+from talkshowguests.workers import ParsePool
+
+
+class ZdfScriptCache:
+    """
+    Episodes extracted from the <script> elements of ZDF pages,
+    keyed by a hash of the script, across crawls.
+
+    Most scripts are React boilerplate that doesn't change between
+    crawls, and even those that contain episodes rarely change,
+    so we only need to decode the scripts that did.
+    Scripts that were not seen in a crawl are removed after it
+    finished.
+    """
+
+    def __init__(self, path: str):
+        self.db = shelve.open(path)
+        self.seen_keys: set[str] = set()
+
+    @classmethod
+    def from_crawler(cls, crawler, name: str):
+        cache_dir = data_path(
+            crawler.settings["ZDF_SCRIPT_CACHE_DIR"], createdir=True)
+        cache = cls(str(pathlib.Path(cache_dir, name)))
+        crawler.signals.connect(cache.close, signal=signals.spider_closed)
+        return cache
+
+    @staticmethod
+    def get_key(script_text: str) -> str:
+        return hashlib.sha256(script_text.encode()).hexdigest()
+
+    def get_episodes(self, script_text: str) -> list[dict]:
+        key = self.get_key(script_text)
+        self.seen_keys.add(key)
+        if key not in self.db:
+            # (Empty for irrelevant scripts)
+            self.db[key] = get_episodes_from_script(script_text)
+        return self.db[key]
+
+    def get_cached_keys(self) -> frozenset[str]:
+        return frozenset(self.db.keys())
+
+    def add_episodes(
+            self,
+            key: str,
+            episodes: list[dict] | None,
+    ) -> list[dict]:
+        """
+        Store the episodes of a script decoded elsewhere, or return the
+        cached ones if `episodes` is None.
+        """
+        self.seen_keys.add(key)
+        if episodes is not None:
+            self.db[key] = episodes
+        return self.db[key]
+
+    def close(self, reason: str):
+        # Only after complete crawls, so that a failed crawl doesn't
+        # remove the scripts of the pages it didn't get to:
+        if self.seen_keys and reason == "finished":
+            # Keep the cache from growing with every changed script
+            for key in set(self.db.keys()) - self.seen_keys:
+                del self.db[key]
+        self.db.close()
 
 
 def get_episodes_from_zdf_page(
         response,
         debug_dump_json=False,
+        script_cache: ZdfScriptCache | None = None,
 ):
     # All relevant content is included in many <script>
     # elements at the end of the page:
-    script_elems = response.css("script::text")
-
-    for script_elem in script_elems:
-        script_data = parse_script_text(script_elem.get())
-        if not script_data:
-            continue
-
-        # Useful if you want to inspect the json objects.
-        if debug_dump_json:
-            with open(
-                f"debug_script-data_{hash(script_elem.get())}.json",
-                "w"
-            ) as f:
-                json.dump(script_data, f, indent=2, ensure_ascii=False)
-
-        # Get all past episodes:
-        try:
-            season_objs: list[dict] = script_data[0][
-                "result"]["data"][
-                "smartCollectionByCanonical"][
-                "seasons"][
-                "nodes"]
-            for season_obj in season_objs:
-                for ep in season_obj["episodes"]["nodes"]:
-                    yield ep
-        except (KeyError, TypeError):
-            # Probably not the script_elem we are looking for
-            pass
-
-        # Get the next unaired episode, which is unfortunately
-        # not listed in the seaons_objs:
-        try:
-            # Structure of script_data when it contains the next episode
-            # (hopefully always):
-            # ["$L3a", ["$", "$L3b", null, {"children": ["$", "$L3e", null,
-            # {"collection": {...}}]}]]
-            yield script_data[1][3]["children"][3]["collection"]
-        except (IndexError, KeyError, TypeError):
-            # Probably not the script_elem we are looking for
-            continue
+    for script_text in response.css("script::text").getall():
+        if script_cache is not None and not debug_dump_json:
+            yield from script_cache.get_episodes(script_text)
+        else:
+            yield from get_episodes_from_script(
+                script_text, debug_dump_json=debug_dump_json)
 
 
-def parse_script_text(text: str) -> dict:
+async def get_episodes_from_zdf_page_async(
+        response,
+        script_cache: ZdfScriptCache | None = None,
+        parse_pool: ParsePool | None = None,
+) -> list[dict]:
     """
-    Attempt to convert the content of a <script>
-    tag to json.
+    Same as `get_episodes_from_zdf_page`, but parses the page and
+    decodes its scripts in `parse_pool`, if given.
+    """
+    if parse_pool is None:
+        return list(get_episodes_from_zdf_page(
+            response, script_cache=script_cache))
+    cached_keys = (
+        script_cache.get_cached_keys() if script_cache is not None
+        else frozenset()
+    )
+    episodes = []
+    for key, script_episodes in await parse_pool.run(
+            get_episodes_by_script, response.text, cached_keys):
+        if script_cache is not None:
+            script_episodes = script_cache.add_episodes(key, script_episodes)
+        episodes.extend(script_episodes)
+    return episodes
+
+
+def get_episodes_by_script(
+        html: str,
+        cached_keys: frozenset[str],
+) -> list[tuple[str, list[dict] | None]]:
+    """
+    Return the key (see `ZdfScriptCache`) and the episodes of each
+    <script> element of a ZDF page, or None instead of the episodes of
+    scripts whose key is in `cached_keys`.
+    Runs in a worker of `ParsePool`.
+    """
+    results = []
+    for script_text in Selector(text=html).css("script::text").getall():
+        key = ZdfScriptCache.get_key(script_text)
+        results.append((
+            key,
+            None if key in cached_keys
+            else get_episodes_from_script(script_text),
+        ))
+    return results
+
+
+_EPISODE_PATHS = [
+    # All past episodes:
+    (0, "result", "data", "smartCollectionByCanonical", "seasons", "nodes",
+     "*", "episodes", "nodes", "*"),
+    # The next unaired episode, which is unfortunately not listed in
+    # the seasons. Structure of the script data when it contains the
+    # next episode (hopefully always):
+    # ["$L3a", ["$", "$L3b", null, {"children": ["$", "$L3e", null,
+    # {"collection": {...}}]}]]
+    (1, 3, "children", 3, "collection"),
+]
+"""Paths of the episodes in the JSON data of a <script> element"""
+
+
+def get_episodes_from_script(
+        script_text: str,
+        debug_dump_json=False,
+) -> list[dict]:
+    json_text = get_script_json(script_text)
+    if json_text is None:
+        return []
+
+    # Useful if you want to inspect the json objects.
+    if debug_dump_json:
+        script_data = parse_script_text(script_text)
+        with open(
+            f"debug_script-data_{hash(script_text)}.json",
+            "w"
+        ) as f:
+            json.dump(script_data, f, indent=2, ensure_ascii=False)
+
+    try:
+        return extract_json_paths(json_text, _EPISODE_PATHS)
+    except (ValueError, IndexError):
+        # Probably not the script_elem we are looking for
+        return []
+
+
+def get_script_json(text: str) -> str | None:
+    """
+    Return the JSON text contained in a <script> tag
+    or None if there is none.
     Placing lots of such <script> tags at the end
     of a webpage instead of using regular HTML
     seems to be a React thing.
     """
     match = re.search(
         r'self\.__next_f\.push\('
-        r'\[1,"[a-z0-9]+:'  # \[
-        r'(.*?)'
-        r'"\]\);?',  # has to be closed by a `])`
+        r'\[1,"[a-z0-9]+:',  # \[
         text,
-        re.DOTALL,  # make `.` also match newlines
     )
     if not match:
-        return {}
-    escaped_json = match.group(1)
-    unescaped_json = json.loads(f'"{escaped_json}"')
+        return None
+    # Unescape the JS string directly from the script text instead of
+    # copying it first:
+    try:
+        json_text, end = json.decoder.scanstring(text, match.end())
+    except json.JSONDecodeError:
+        return None
+    if not text.startswith("])", end):  # has to be closed by a `])`
+        return None
+    return json_text
+
 
+def parse_script_text(text: str) -> dict:
+    """
+    Attempt to convert the content of a <script>
+    tag to json.
+    """
+    json_text = get_script_json(text)
+    if json_text is None:
+        return {}
     try:
-        return json.loads(unescaped_json)
+        return json.loads(json_text)
     except json.JSONDecodeError as e:
         return {}
+
+
+_JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_JSON_STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"')
+_JSON_NEXT_BRACKET = re.compile(
+    r'(?:[^"\[\]{}]++|"[^"\\]*+(?:\\.[^"\\]*+)*+")*+[\[\]{}]')
+"""Everything up to the next bracket that is not within a string"""
+_json_decoder = json.JSONDecoder()
+
+
+def extract_json_paths(text: str, paths: list[tuple]) -> list:
+    """
+    Decode only the values at `paths` in the JSON document `text`,
+    in document order.
+
+    A path is a tuple of object keys and array indexes, "*" matches
+    any key or index. Everything else is only scanned, not decoded,
+    so the flight payloads of ZDF pages (with lots of React
+    boilerplate) are never materialized as a whole.
+
+    Raises ValueError (or IndexError) for invalid JSON.
+    """
+    values = []
+    _extract_json_paths(text, _skip_json_whitespace(text, 0), paths, values)
+    return values
+
+
+def _skip_json_whitespace(text: str, pos: int) -> int:
+    return _JSON_WHITESPACE.match(text, pos).end()
+
+
+def _extract_json_paths(
+        text: str,
+        pos: int,
+        paths: list[tuple],
+        values: list,
+) -> int:
+    """Extract the value at `pos`, return the position after it."""
+    if () in paths:
+        value, pos = _json_decoder.raw_decode(text, pos)
+        values.append(value)
+        return pos
+    char = text[pos]
+    if not paths or char not in "[{":
+        return _skip_json_value(text, pos)
+
+    is_object = char == "{"
+    end_char = "}" if is_object else "]"
+    pos = _skip_json_whitespace(text, pos + 1)
+    if text[pos] == end_char:
+        return pos + 1
+    index = 0
+    while True:
+        if is_object:
+            if text[pos] != '"':
+                raise ValueError(f"Expected key at {pos}")
+            key, pos = json.decoder.scanstring(text, pos + 1)
+            pos = _skip_json_whitespace(text, pos)
+            if text[pos] != ":":
+                raise ValueError(f"Expected ':' at {pos}")
+            pos = _skip_json_whitespace(text, pos + 1)
+        else:
+            key = index
+            index += 1
+        pos = _extract_json_paths(
+            text,
+            pos,
+            [path[1:] for path in paths if path[0] in (key, "*")],
+            values,
+        )
+        pos = _skip_json_whitespace(text, pos)
+        if text[pos] == end_char:
+            return pos + 1
+        if text[pos] != ",":
+            raise ValueError(f"Expected ',' or '{end_char}' at {pos}")
+        pos = _skip_json_whitespace(text, pos + 1)
+
+
+def _skip_json_value(text: str, pos: int) -> int:
+    """Return the position after the value at `pos` without decoding it."""
+    char = text[pos]
+    if char == '"':
+        match = _JSON_STRING.match(text, pos)
+        if not match:
+            raise ValueError(f"Unterminated string at {pos}")
+        return match.end()
+    if char not in "[{":
+        # Numbers, true, false, null
+        return _json_decoder.raw_decode(text, pos)[1]
+    depth = 0
+    while True:
+        match = _JSON_NEXT_BRACKET.match(text, pos)
+        if not match:
+            raise ValueError(f"Unterminated value at {pos}")
+        pos = match.end()
+        if text[pos - 1] in "[{":
+            depth += 1
+        else:
+            depth -= 1
+            if depth == 0:
+                return pos
@@ -0,0 +1,78 @@
+"""
+Optional pool of workers for CPU-heavy parsing (PARSE_WORKERS), so that
+parsing a large page doesn't block the reactor, and with it the
+downloads and callbacks of all other spiders.
+
+Only the ZDF pages (see `utils_zdf.get_episodes_from_zdf_page_async`)
+are parsed in the pool. The pages of Das Erste and tvtickets.de take a
+few milliseconds to parse, about as long as sending them to a worker
+process, so they are still parsed in the callbacks.
+"""
+
+import asyncio
+import concurrent.futures
+import multiprocessing
+from typing import Any, Callable
+
+from scrapy import signals
+
+
+class ParsePool:
+    """
+    Runs functions in a pool of worker processes or threads
+    (PARSE_WORKERS_KIND "process" or "thread"), shared by all crawlers
+    of a process.
+
+    With processes, the functions, their arguments and results have to
+    be picklable. Threads only help where the work releases the GIL,
+    like lxml's parsing.
+    """
+
+    _executors: dict[tuple[str, int], concurrent.futures.Executor] = {}
+    _num_users: dict[tuple[str, int], int] = {}
+    """Number of crawlers using each executor"""
+
+    def __init__(self, key: tuple[str, int]):
+        self.key = key
+        self.executor = self._executors[key]
+
+    @classmethod
+    def from_crawler(cls, crawler) -> "ParsePool | None":
+        """Return the pool of the process, or None if not enabled."""
+        workers = crawler.settings.getint("PARSE_WORKERS")
+        if workers <= 0:
+            return None
+        kind = crawler.settings["PARSE_WORKERS_KIND"]
+        key = (kind, workers)
+        if key not in cls._executors:
+            if kind == "process":
+                cls._executors[key] = concurrent.futures.ProcessPoolExecutor(
+                    workers,
+                    # Forking a process with a running reactor and
+                    # threads isn't safe:
+                    mp_context=multiprocessing.get_context("forkserver"),
+                )
+            elif kind == "thread":
+                cls._executors[key] = concurrent.futures.ThreadPoolExecutor(
+                    workers, thread_name_prefix="parse")
+            else:
+                raise ValueError(f"Invalid PARSE_WORKERS_KIND: {kind}")
+        cls._num_users[key] = cls._num_users.get(key, 0) + 1
+        pool = cls(key)
+        crawler.signals.connect(pool.close, signal=signals.engine_stopped)
+        return pool
+
+    def close(self):
+        """
+        Shut the workers down once no crawler uses them anymore, so
+        that they don't pile up across the crawls of 'serve'.
+        """
+        self._num_users[self.key] -= 1
+        if self._num_users[self.key] == 0:
+            del self._num_users[self.key]
+            del self._executors[self.key]
+            self.executor.shutdown(cancel_futures=True)
+
+    async def run(self, func: Callable, *args) -> Any:
+        """Return the result of `func(*args)` from a worker."""
+        return await asyncio.wrap_future(self.executor.submit(func, *args))
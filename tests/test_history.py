@@ -0,0 +1,76 @@
+import json
+import pathlib
+import sqlite3
+import tempfile
+import unittest
+
+from talkshowguests.history import HistoryStore
+
+
+class HistoryStoreRevisionsTest(unittest.TestCase):
+    def setUp(self):
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.history_file = pathlib.Path(tmp_dir.name, "history.sqlite")
+
+    def test_entry_from_before_revisions_is_kept(self):
+        # Database as written before revisions were stored:
+        old = {
+            "name": "Maischberger",
+            "isodate": "2026-10-20T00:00:00",
+            "topic": "Topic",
+            "guests": [{"name": "Anna A", "affiliation": "SPD"}],
+            "reported_on": "2026-10-18T10:00:00",
+        }
+        db = sqlite3.connect(self.history_file)
+        db.execute(
+            "CREATE TABLE episodes ("
+            " isodate TEXT NOT NULL,"
+            " name TEXT NOT NULL,"
+            " data TEXT NOT NULL,"
+            " PRIMARY KEY (isodate, name)"
+            ") WITHOUT ROWID"
+        )
+        db.execute(
+            "INSERT INTO episodes (isodate, name, data) VALUES (?, ?, ?)",
+            (old["isodate"], old["name"], json.dumps(old)),
+        )
+        db.commit()
+        db.close()
+
+        history = HistoryStore(self.history_file)
+        self.addCleanup(history.close)
+        new = {
+            **old,
+            "guests": [
+                *old["guests"],
+                {"name": "Bob B", "affiliation": ""},
+            ],
+            "reported_on": "2026-10-19T10:00:00",
+            "diff_keys": ["guests"],
+        }
+        history.upsert([new])
+
+        self.assertEqual(
+            history.get_revisions(old["isodate"], old["name"]),
+            [old, new],
+        )
+        self.assertEqual(history.get(old["isodate"], old["name"]), new)
+
+    def test_revisions_are_appended(self):
+        history = HistoryStore(self.history_file)
+        self.addCleanup(history.close)
+        states = [
+            {"name": "Hart aber fair", "isodate": "2026-10-19",
+             "topic": topic}
+            for topic in ["A", "B", "C"]
+        ]
+        for state in states:
+            history.upsert([state])
+
+        self.assertEqual(
+            history.get_revisions("2026-10-19", "Hart aber fair"), states)
+
+
+if __name__ == "__main__":
+    unittest.main()
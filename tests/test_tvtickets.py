@@ -0,0 +1,57 @@
+import unittest
+
+from scrapy.http import HtmlResponse
+
+from talkshowguests.spiders.utils_tvtickets import get_tickets_index
+
+
+def _event(day, month, year, doors=" 17:30 ", tickets="BUCHEN") -> str:
+    doors = (
+        f'<span class="termin_abholen">{doors}</span>'
+        if doors is not None else ""
+    )
+    return (
+        '<div class="date_wrapper">'
+        f'<span class="day">{day}</span>'
+        f'<span class="month">{month}</span>'
+        f'<span class="year">{year}</span>'
+        f"{doors}"
+        f'<span class="btn_tickets_buchen_info">{tickets}</span>'
+        "</div>"
+    )
+
+
+class GetTicketsIndexTest(unittest.TestCase):
+    def test_bad_events_are_skipped(self):
+        response = HtmlResponse(
+            "https://tvtickets.de/example",
+            body=(
+                "<html>"
+                + _event(20, "OKT", 2026)
+                + _event(21, "OCT", 2026)  # unknown month
+                + _event("", "OKT", 2026)  # no day
+                + _event(32, "OKT", 2026)  # no such day
+                + _event(22, "OKT", 2026, doors=None, tickets="AUSGEBUCHT")
+                + "</html>"
+            ).encode(),
+            encoding="utf-8",
+        )
+
+        with self.assertLogs(
+                "talkshowguests.spiders.utils_tvtickets", "WARNING") as logs:
+            index = get_tickets_index(response, "Berlin Adlershof")
+
+        self.assertEqual(list(index), ["2026-10-20", "2026-10-22"])
+        self.assertEqual(len(logs.output), 3)
+        self.assertEqual(dict(index["2026-10-20"]), {
+            "location": "Berlin Adlershof",
+            "tickets_available": True,
+            "doors": "17:30",
+            "tickets_url": "https://tvtickets.de/example",
+        })
+        self.assertEqual(index["2026-10-22"]["doors"], "")
+        self.assertFalse(index["2026-10-22"]["tickets_available"])
+
+
+if __name__ == "__main__":
+    unittest.main()